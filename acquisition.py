@@ -0,0 +1,322 @@
+import queue
+import threading
+import time
+import traceback
+
+import numpy as np
+import serial
+import serial.tools.list_ports
+
+from metrics import AcquisitionMetrics
+from serial_protocol import STARTING_LINE, FINISHED_LINE, FrameDecoder, parse_text_line, parse_handshake
+
+# Events posted to the GUI, drained from the event queue on the Tk main loop
+EVENT_STARTING = 'starting'  # Firmware is (re)starting; payload None
+EVENT_READY = 'ready'  # Handshake finished; payload is the advertised options dict
+EVENT_DISCONNECTED = 'disconnected'  # Serial error; payload is (exception text, clock() time of the loss)
+EVENT_RECONNECTING = 'reconnecting'  # Supervisor is waiting to retry; payload is (attempt, delay, reason)
+EVENT_RECONNECTED = 'reconnected'  # Port is open again; payload is clock() time of the reconnect
+EVENT_FAILED = 'failed'  # Reading stopped for good on an unexpected error; payload is (error text, clock() time)
+
+
+class AcquisitionWorker:
+    # Reads the serial port on its own thread and only produces data:
+    #   - parsed sample blocks are handed to on_samples(timestamps, values) on this thread
+    #   - handshake and error events go onto a bounded queue for the GUI to drain
+    # The port lock is held only while reading bytes that are already buffered, never across a wait.
+    # Samples and events are stamped with `clock`, monotonic by default, so the timestamps of several
+    # walkers read in one process are directly comparable and unaffected by wall clock adjustments.
+
+    def __init__(self, port, on_samples, lock=None, event_queue_size=256, poll_timeout=0.05,
+                 is_console_enabled=False, clock=time.monotonic):
+        self.port = port
+        self.on_samples = on_samples
+        self.clock = clock
+        self.lock = lock or threading.Lock()
+        self.events = queue.Queue(maxsize=event_queue_size)
+        self.poll_timeout = poll_timeout
+        self.is_console_enabled = is_console_enabled
+        self.finished_startup = False
+        self.frame_decoder = None  # Set when the firmware advertises binary framing
+        self.sample_rate = None  # Advertised by binary-mode firmware, used to timestamp blocks
+        self.metrics = AcquisitionMetrics()
+        self.events_dropped = 0
+        self.is_reading = False
+        self.thread = None
+        self._line_buffer = b''
+        self._restart_tail = b''
+
+    @property
+    def parse_failures(self):
+        return self.metrics.parse_failures
+
+    def start(self):
+        self.port.timeout = self.poll_timeout
+        self.is_reading = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self.is_reading = False
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join(timeout)
+
+    def post_event(self, kind, payload=None):
+        try:
+            self.events.put_nowait((kind, payload))
+        except queue.Full:
+            self.events_dropped += 1
+
+    def run(self):
+        try:
+            self.read_loop()
+        except serial.SerialException as e:
+            print("Serial error:", e)
+            self.is_reading = False
+            self.post_event(EVENT_DISCONNECTED, (str(e), self.clock()))
+        except Exception as e:  # A bug in decoding or on_samples; without this the thread dies silently
+            traceback.print_exc()
+            self.is_reading = False
+            self.post_event(EVENT_FAILED, (f"{type(e).__name__}: {e}", self.clock()))
+
+    def read_loop(self):
+        # Reads until stopped; serial errors are raised to the caller (run() or the supervisor)
+        while self.is_reading:
+            with self.lock:
+                hold_start = time.perf_counter()
+                backlog = self.port.in_waiting
+                chunk = self.port.read(backlog) if backlog else b''
+                hold = time.perf_counter() - hold_start
+            self.metrics.record_read(hold, backlog)
+            if not chunk:
+                # Nothing buffered: wait up to poll_timeout for the next byte without holding the lock
+                chunk = self.port.read(1)
+                if not chunk:
+                    continue
+            timestamp = self.clock()
+            if self.frame_decoder is not None:
+                self.handle_frames(chunk, timestamp)
+            else:
+                self.handle_text(chunk, timestamp)
+
+    def reset_stream(self):
+        # A new connection starts mid-stream: drop partial lines and frames from the old one
+        self._line_buffer = b''
+        self._restart_tail = b''
+        if self.frame_decoder is not None:
+            self.frame_decoder.reset()
+
+    def health(self, prefix='acq_'):
+        # Metrics snapshot plus the binary decoder's own counters, as HDF5 attributes for the recording
+        stats = self.metrics.snapshot()
+        decoder = self.frame_decoder
+        stats['lost_frames'] = decoder.lost_frames if decoder else 0
+        stats['resyncs'] = decoder.resyncs if decoder else 0
+        stats['events_dropped'] = self.events_dropped
+        return {prefix + name: value for name, value in stats.items()}
+
+    def handle_starting(self):
+        self.finished_startup = False
+        self.frame_decoder = None  # The handshake is always text
+        self.post_event(EVENT_STARTING)
+
+    def handle_text(self, chunk, timestamp):
+        *lines, self._line_buffer = (self._line_buffer + chunk).split(b'\n')
+        rows = []
+        for index, raw in enumerate(lines):
+            line = raw.decode(errors='replace').strip()
+            if not line:
+                continue
+            if line == STARTING_LINE:
+                self.emit(rows, timestamp)
+                rows = []
+                self.handle_starting()
+                continue  # Skip parsing and wait for actual data
+            if line.startswith(FINISHED_LINE):
+                self.finished_startup = True
+                options = parse_handshake(line)
+                if options['mode'] == 'binary':
+                    self.frame_decoder = FrameDecoder()
+                    self.sample_rate = float(options.get('rate') or 0) or None
+                self.post_event(EVENT_READY, options)
+                if self.frame_decoder is not None:
+                    # Whatever followed the handshake in this chunk is already binary
+                    rest = b'\n'.join(lines[index + 1:] + [self._line_buffer])
+                    self._line_buffer = b''
+                    self.emit(rows, timestamp)
+                    self.handle_frames(rest, timestamp)
+                    return
+                continue
+            try:
+                rows.append(parse_text_line(line))
+                if self.is_console_enabled:
+                    print("RR:", rows[-1][0], "RF:", rows[-1][1], "LR:", rows[-1][2], "LF:", rows[-1][3])
+            except ValueError:
+                if self.finished_startup:
+                    self.metrics.record_parse_failure()
+                    if self.is_console_enabled:
+                        print("Received data not in expected format:", line)
+        self.emit(rows, timestamp)
+
+    def emit(self, rows, timestamp):
+        if rows:
+            timestamps = np.full(len(rows), timestamp)
+            self.metrics.record_block(timestamps)
+            self.on_samples(timestamps, np.array(rows, dtype=np.float64))
+
+    def handle_frames(self, chunk, timestamp):
+        # Keep the end of the previous read so a restart message split across reads is still seen
+        marker = STARTING_LINE.encode()
+        window = self._restart_tail + chunk
+        restart = window.find(marker)
+        if restart >= 0:
+            # Firmware restarted and is repeating the text handshake. Frames that arrived before the
+            # marker in this read are still decoded (the tail was fed with the previous read).
+            self.decode_frames(chunk[:max(restart - len(self._restart_tail), 0)], timestamp)
+            self.frame_decoder = None
+            self._line_buffer = b''
+            self._restart_tail = b''
+            self.handle_text(window[restart:], timestamp)
+            return
+        self._restart_tail = window[-(len(marker) - 1):]
+        self.decode_frames(chunk, timestamp)
+
+    def decode_frames(self, data, timestamp):
+        counters, counts = self.frame_decoder.feed(data)
+        if not len(counters):
+            return
+        # Back-date each frame from the block arrival time using its sample counter
+        if self.sample_rate:
+            offsets = ((int(counters[-1]) - counters.astype(np.int64)) & 0xFFFF) / self.sample_rate
+        else:
+            offsets = np.zeros(len(counters))
+        timestamps = timestamp - offsets
+        self.metrics.record_block(timestamps)
+        self.on_samples(timestamps, counts.astype(np.float64))
+
+
+
+def port_identity(device):
+    # USB identity of a port, used to find the same walker again if it re-enumerates under a new name
+    for info in serial.tools.list_ports.comports():
+        if info.device == device and info.vid is not None:
+            return info.vid, info.pid, info.serial_number
+    return None
+
+
+def find_port(device, identity):
+    if identity is not None:
+        for info in serial.tools.list_ports.comports():
+            if (info.vid, info.pid, info.serial_number) == identity:
+                return info.device
+    return device
+
+
+class AcquisitionSupervisor:
+    # Owns the serial port lifecycle for one AcquisitionWorker. A single supervisor thread opens the
+    # port, runs the worker's read loop on it and, when the port fails, closes it and reconnects with
+    # exponential backoff, looking the device up again by its USB identity. Waiting is done on an
+    # Event, so an unplugged walker costs no CPU, and there is only ever one reader.
+
+    def __init__(self, worker, device, open_port, initial_backoff=0.5, max_backoff=10.0):
+        self.worker = worker
+        self.device = device
+        self.open_port = open_port  # open_port(device) -> open serial.Serial-like object
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.identity = port_identity(device)
+        self.port = None
+        self.reconnects = 0
+        self.errors = 0  # Unexpected read errors in a row, each within error_window seconds of the last start
+        self.max_errors = 3
+        self.error_window = 60.0
+        self.thread = None
+        self._stop_event = threading.Event()
+
+    @property
+    def is_running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self, port=None):
+        # `port` is an already open port to begin with; otherwise the first open happens on the thread
+        if self.is_running:
+            return self
+        self.port = port
+        self._stop_event.clear()
+        self.worker.is_reading = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._stop_event.set()
+        self.worker.is_reading = False
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join(timeout)
+        self.close_port()
+
+    def close_port(self):
+        port, self.port = self.port, None
+        if port is not None:
+            try:
+                with self.worker.lock:
+                    port.close()
+            except (serial.SerialException, OSError):
+                pass
+
+    def backoff(self, attempt):
+        return min(self.max_backoff, self.initial_backoff * 2 ** (attempt - 1))
+
+    def run(self):
+        attempt = 0
+        while not self._stop_event.is_set():
+            if self.port is None:
+                try:
+                    self.device = find_port(self.device, self.identity)
+                    self.port = self.open_port(self.device)
+                except (serial.SerialException, OSError) as e:
+                    attempt += 1
+                    delay = self.backoff(attempt)
+                    self.worker.post_event(EVENT_RECONNECTING, (attempt, delay, str(e)))
+                    self._stop_event.wait(delay)
+                    continue
+                except Exception as e:  # Not a missing device, so retrying cannot help
+                    traceback.print_exc()
+                    self.worker.is_reading = False
+                    self.worker.post_event(EVENT_FAILED, (f"{type(e).__name__}: {e}", self.worker.clock()))
+                    return
+                if attempt:
+                    self.reconnects += 1
+                    self.worker.post_event(EVENT_RECONNECTED, self.worker.clock())
+            attempt = 0
+            self.port.timeout = self.worker.poll_timeout
+            self.worker.port = self.port
+            self.worker.reset_stream()
+            self.worker.is_reading = True
+            started = time.monotonic()
+            try:
+                self.worker.read_loop()
+            except (serial.SerialException, OSError) as e:
+                print("Serial error:", e)
+                self.worker.post_event(EVENT_DISCONNECTED, (str(e), self.worker.clock()))
+                attempt = 1
+            except Exception as e:
+                # A bug in decoding or on_samples: the stream starts over on a reopened port, like after
+                # an unplug, rather than the only reader dying while the app still looks connected. An
+                # error that keeps coming back right away ends reading instead.
+                traceback.print_exc()
+                reason = f"{type(e).__name__}: {e}"
+                self.errors = 1 if time.monotonic() - started > self.error_window else self.errors + 1
+                if self.errors >= self.max_errors:
+                    self.close_port()
+                    self.worker.is_reading = False
+                    self.worker.post_event(EVENT_FAILED, (reason, self.worker.clock()))
+                    return
+                self.worker.post_event(EVENT_DISCONNECTED, (reason, self.worker.clock()))
+                attempt = self.errors
+            self.close_port()
+            if attempt:
+                delay = self.backoff(attempt)
+                self.worker.post_event(EVENT_RECONNECTING, (attempt, delay, "waiting for device"))
+                self._stop_event.wait(delay)
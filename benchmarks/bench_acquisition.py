@@ -0,0 +1,128 @@
+# Acquisition benchmark suite, run against the simulated walker (no hardware needed):
+#   - maximum sustained sample rate before drops, text and binary
+#   - per-sample parse cost of the acquisition hot path
+#   - end-to-end latency from a sample leaving the device to on_samples
+#   - stream/finalize/load time of long sessions
+#
+#   python benchmarks/bench_acquisition.py --seconds 3 --session-minutes 60
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from acquisition import AcquisitionWorker  # noqa: E402
+from recording_file import StreamingH5Writer, load_recording  # noqa: E402
+from simulator import SimulatedSerial, WalkerSimulator  # noqa: E402
+
+RATES_HZ = (80, 250, 500, 1000, 1500, 2000, 3000, 5000)
+
+
+class Collector:
+    def __init__(self, port):
+        self.port = port
+        self.samples = 0
+        self.latencies = []
+
+    def on_samples(self, timestamps, values):
+        now = time.monotonic()
+        self.samples += len(timestamps)
+        due = self.port.start_time + self.port.simulator.sample_due_time(self.samples - 1)
+        self.latencies.append(now - due)
+
+
+def run_acquisition(rate, mode, baud, seconds):
+    simulator = WalkerSimulator(rate=rate, mode=mode, startup_delay=0.0, seed=0)
+    port = SimulatedSerial(simulator, baud=baud, buffer_limit=4096)  # Typical OS serial input buffer
+    collector = Collector(port)
+    worker = AcquisitionWorker(port, collector.on_samples).start()
+    time.sleep(seconds)
+    worker.stop()
+    failures = worker.parse_failures + (worker.frame_decoder.lost_frames if worker.frame_decoder else 0)
+    return simulator.samples_sent, collector, port.overrun_bytes, simulator.samples_skipped + failures
+
+
+def bench_sustained_rate(mode, baud, seconds):
+    print(f"\nSustained rate, {mode} at {baud} baud ({seconds:g} s per rate)")
+    best = None
+    for rate in RATES_HZ:
+        sent, collector, overrun, lost = run_acquisition(rate, mode, baud, seconds)
+        received = collector.samples
+        # Samples still in flight on the link at the end of the run do not count as drops
+        dropped = overrun > 0 or lost > 0 or received < 0.95 * sent
+        latencies = np.array(collector.latencies[len(collector.latencies) // 10:]) * 1e3
+        p50, p99 = (np.percentile(latencies, (50, 99)) if len(latencies) else (float('nan'), float('nan')))
+        print(f"  {rate:>6} Hz: sent {sent:>7} received {received:>7} overrun {overrun:>6} B "
+              f"lost {lost:>5}  latency p50 {p50:6.2f} ms p99 {p99:7.2f} ms  {'DROPS' if dropped else 'ok'}")
+        if not dropped:
+            best = rate
+        else:
+            break
+    print(f"  max sustained: {best} Hz")
+
+
+def bench_parse_cost(mode, n_samples):
+    simulator = WalkerSimulator(rate=1000, mode=mode, seed=0)
+    stream = simulator.handshake() + simulator.encode(0, simulator.samples(0, n_samples))
+    received = []
+    worker = AcquisitionWorker(None, lambda timestamps, values: received.append(len(timestamps)))
+    block = 4096
+    start = time.perf_counter()
+    for pos in range(0, len(stream), block):
+        chunk = stream[pos:pos + block]
+        if worker.frame_decoder is not None:
+            worker.handle_frames(chunk, 0.0)
+        else:
+            worker.handle_text(chunk, 0.0)
+    elapsed = time.perf_counter() - start
+    print(f"  {mode:>6}: {elapsed / n_samples * 1e6:6.2f} us/sample ({sum(received)} samples)")
+
+
+def bench_session(minutes, rate):
+    n = int(minutes * 60 * rate)
+    simulator = WalkerSimulator(rate=rate, seed=0)
+    block = int(rate * 0.05)  # The reader hands over ~50 ms blocks
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, 'session.h5')
+        writer = StreamingH5Writer(filename, flush_interval=1.0, attrs={'raw_counts': False}).open()
+        values = simulator.samples(0, block)
+        start = time.perf_counter()
+        for first in range(0, n, block):
+            writer.extend((first + np.arange(block)) / rate, values)
+        append_time = time.perf_counter() - start
+        start = time.perf_counter()
+        writer.close()
+        finalize_time = time.perf_counter() - start
+        size = os.path.getsize(filename)
+        start = time.perf_counter()
+        data, _ = load_recording(filename)
+        load_time = time.perf_counter() - start
+    print(f"  {minutes:g} min @ {rate:g} Hz ({len(data)} samples, {size / 1e6:.1f} MB): "
+          f"append {append_time:.2f} s, stop/finalize {finalize_time * 1e3:.0f} ms, load {load_time:.2f} s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Acquisition benchmark suite")
+    parser.add_argument('--seconds', type=float, default=3.0, help="run time per sustained-rate step")
+    parser.add_argument('--baud', type=int, default=500000, help="simulated link speed (default: 500000)")
+    parser.add_argument('--parse-samples', type=int, default=100000)
+    parser.add_argument('--session-minutes', type=float, default=60.0)
+    parser.add_argument('--session-rate', type=float, default=1000.0)
+    args = parser.parse_args()
+
+    bench_sustained_rate('text', args.baud, args.seconds)
+    bench_sustained_rate('binary', args.baud, args.seconds)
+    print("\nParse cost")
+    bench_parse_cost('text', args.parse_samples)
+    bench_parse_cost('binary', args.parse_samples)
+    print("\nLong session save")
+    bench_session(args.session_minutes, args.session_rate)
+
+
+if __name__ == '__main__':
+    main()
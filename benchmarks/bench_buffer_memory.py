@@ -0,0 +1,65 @@
+# Memory benchmark: per-channel lists of (timestamp, value) tuples vs. the columnar SampleBuffer
+#
+#   python benchmarks/bench_buffer_memory.py --rate 80
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sample_buffer import SampleBuffer  # noqa: E402
+
+DURATIONS_MIN = (1, 10, 60)
+
+
+def fill_lists(n_samples):
+    data = {'rr': [], 'rf': [], 'lr': [], 'lf': []}
+    for i in range(n_samples):
+        timestamp = i * 0.0125
+        rr, rf, lr, lf = float(i), float(i + 1), float(i + 2), float(i + 3)
+        data['rr'].append((timestamp, rr))
+        data['rf'].append((timestamp, rf))
+        data['lr'].append((timestamp, lr))
+        data['lf'].append((timestamp, lf))
+    return data
+
+
+def fill_buffer(n_samples):
+    data = SampleBuffer()
+    for i in range(n_samples):
+        data.append(i * 0.0125, (float(i), float(i + 1), float(i + 2), float(i + 3)))
+    return data
+
+
+def measure(fill, n_samples):
+    tracemalloc.start()
+    start = time.perf_counter()
+    data = fill(n_samples)
+    elapsed = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del data
+    return current, peak, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SampleBuffer memory benchmark")
+    parser.add_argument('--rate', type=float, default=80.0, help="samples per second (default: 80)")
+    args = parser.parse_args()
+
+    print(f"Sample rate: {args.rate:g} Hz")
+    print(f"{'duration':>9} {'samples':>9} {'structure':>10} {'retained MB':>12} {'peak MB':>9} "
+          f"{'B/sample':>9} {'fill s':>7}")
+    for minutes in DURATIONS_MIN:
+        n_samples = int(minutes * 60 * args.rate)
+        for label, fill in (('lists', fill_lists), ('buffer', fill_buffer)):
+            current, peak, elapsed = measure(fill, n_samples)
+            print(f"{minutes:>7} m {n_samples:>9} {label:>10} {current / 1e6:>12.2f} {peak / 1e6:>9.2f} "
+                  f"{current / n_samples:>9.1f} {elapsed:>7.2f}")
+
+
+if __name__ == '__main__':
+    main()
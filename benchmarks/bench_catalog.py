@@ -0,0 +1,88 @@
+# Session catalog: backfill time for a directory of recordings on one process and on all cores, and the
+# time to answer a filter query from the catalog against opening every file to answer it. Half the
+# recordings are written like older files (calibrated channels, no stored stats), so they are scanned.
+#
+#   python benchmarks/bench_catalog.py --files 200 --seconds 600
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import h5py
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from calibration import CalibrationModel  # noqa: E402
+from catalog import SessionCatalog, catalog_filename  # noqa: E402
+from recording_file import LAYOUT_COMPACT, StreamingH5Writer, load_recording  # noqa: E402
+from sample_buffer import CHANNELS  # noqa: E402
+from simulator import WalkerSimulator  # noqa: E402
+
+
+def make_recordings(directory, n_files, seconds, rate):
+    for index in range(n_files):
+        simulator = WalkerSimulator(rate=rate, seed=index, peak_grams=4000.0 + 100 * index)
+        n = int(seconds * rate)
+        counts = simulator.samples(0, n)
+        timestamps = np.arange(n) / rate
+        filename = os.path.join(directory, f"FW_{index:04d}.h5")
+        if index % 2:
+            model = CalibrationModel(simulator.gains, simulator.baseline)
+            with h5py.File(filename, 'w') as f:
+                grams = model.apply(counts)
+                for column, key in enumerate(CHANNELS):
+                    f.create_dataset(key, data=np.column_stack((timestamps, grams[:, column])))
+                f.attrs['start_time'] = time.time() - 86400 * index
+        else:
+            attrs = CalibrationModel(simulator.gains, simulator.baseline).to_attrs()
+            attrs['raw_counts'] = True
+            writer = StreamingH5Writer(filename, attrs=attrs, layout=LAYOUT_COMPACT, dtype=np.int32,
+                                       compression='lzf').open()
+            writer.extend(timestamps, counts)
+            writer.close()
+
+
+def backfill(directory, workers):
+    if os.path.exists(catalog_filename(directory)):
+        os.remove(catalog_filename(directory))
+    start = time.perf_counter()
+    with SessionCatalog(directory=directory) as catalog:
+        catalog.backfill(workers=workers)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Session catalog benchmark")
+    parser.add_argument('--files', type=int, default=100)
+    parser.add_argument('--seconds', type=float, default=600.0, help="length of each recording")
+    parser.add_argument('--rate', type=float, default=80.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        make_recordings(directory, args.files, args.seconds, args.rate)
+        print(f"{args.files} recordings of {args.seconds:g} s at {args.rate:g} Hz")
+        print(f"backfill, 1 process:    {backfill(directory, 1):.2f} s")
+        print(f"backfill, all {os.cpu_count()} cores: {backfill(directory, None):.2f} s")
+
+        # Sessions where the left-front pad peaked above 3 kg
+        start = time.perf_counter()
+        with SessionCatalog(directory=directory) as catalog:
+            hits = catalog.query('lf_max > ?', (3000.0,))
+        query = time.perf_counter() - start
+
+        start = time.perf_counter()
+        scanned = 0
+        for name in sorted(os.listdir(directory)):
+            if name.endswith('.h5'):
+                data, _ = load_recording(os.path.join(directory, name))
+                scanned += data.values[:, CHANNELS.index('lf')].max() > 3000.0
+        scan = time.perf_counter() - start
+        print(f"query lf_max > 3000 g: {len(hits)} sessions in {query * 1000:.1f} ms from the catalog, "
+              f"{scanned} in {scan:.2f} s opening every file")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+# File size, write throughput and read throughput of the HDF5 layouts, on simulated raw counts
+# streamed through StreamingH5Writer in 50 ms blocks as during a recording.
+#
+#   python benchmarks/bench_file_layout.py --minutes 10 --rate 1000
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import h5py
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from recording_file import LAYOUT_CHANNELS, LAYOUT_COMPACT, StreamingH5Writer, read_samples  # noqa: E402
+from simulator import WalkerSimulator  # noqa: E402
+
+FORMATS = (
+    ('channels float64', LAYOUT_CHANNELS, 'float64', None),
+    ('compact float64', LAYOUT_COMPACT, 'float64', None),
+    ('compact float32', LAYOUT_COMPACT, 'float32', None),
+    ('compact float32 lzf', LAYOUT_COMPACT, 'float32', 'lzf'),
+    ('compact int32 lzf', LAYOUT_COMPACT, 'int32', 'lzf'),
+    ('compact int32 gzip', LAYOUT_COMPACT, 'int32', 'gzip'),
+)
+
+
+def bench_format(directory, blocks, rate, layout, dtype, compression, chunk_rows):
+    filename = os.path.join(directory, f'{layout}_{dtype}_{compression}.h5')
+    writer = StreamingH5Writer(filename, flush_interval=1.0, chunk_rows=chunk_rows, attrs={'raw_counts': True},
+                               layout=layout, dtype=dtype, compression=compression).open()
+    start = time.perf_counter()
+    first = 0
+    for values in blocks:
+        writer.extend((first + np.arange(len(values))) / rate, values)
+        first += len(values)
+    writer.close()
+    write_time = time.perf_counter() - start
+    # The pyramid is the same for every layout, so only the samples are counted in the size
+    with h5py.File(filename, 'r') as f:
+        sample_bytes = sum(f[key].id.get_storage_size() for key in f if key != 'lod'
+                           and isinstance(f[key], h5py.Dataset))
+    start = time.perf_counter()
+    with h5py.File(filename, 'r') as f:
+        timestamps, values = read_samples(f)
+    read_time = time.perf_counter() - start
+    assert len(timestamps) == first
+    return sample_bytes, write_time, read_time, first
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HDF5 layout benchmark")
+    parser.add_argument('--minutes', type=float, default=10.0)
+    parser.add_argument('--rate', type=float, default=1000.0)
+    parser.add_argument('--chunk-rows', type=int, default=4096)
+    args = parser.parse_args()
+
+    simulator = WalkerSimulator(rate=args.rate, seed=0)
+    block = int(args.rate * 0.05)
+    n_blocks = int(args.minutes * 60 * args.rate) // block
+    blocks = [simulator.samples(index * block, block) for index in range(n_blocks)]
+    print(f"{args.minutes:g} min @ {args.rate:g} Hz, {n_blocks * block} samples, chunks of {args.chunk_rows} rows")
+    print(f"{'':>20} {'size MB':>8} {'B/sample':>8} {'write Msamples/s':>17} {'read Msamples/s':>16}")
+    with tempfile.TemporaryDirectory() as directory:
+        for label, layout, dtype, compression in FORMATS:
+            size, write_time, read_time, n = bench_format(directory, blocks, args.rate, layout, dtype,
+                                                          compression, args.chunk_rows)
+            print(f"{label:>20} {size / 1e6:8.1f} {size / n:8.1f} {n / write_time / 1e6:17.2f} "
+                  f"{n / read_time / 1e6:16.2f}")
+
+
+if __name__ == '__main__':
+    main()
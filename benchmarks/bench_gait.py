@@ -0,0 +1,61 @@
+# Cost of the online gait analysis on the acquisition thread: calibration plus cycle detection over
+# blocks of simulated walker samples, as the reader delivers them. Reports the share of one core it
+# takes at the acquisition rate, checks that the cycles found do not depend on the block size, and
+# that the cycle count matches the simulated cadence.
+#
+#   python benchmarks/bench_gait.py --rate 1000 --block 50 --minutes 10
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from calibration import CalibrationModel  # noqa: E402
+from gait import GaitAnalyzer  # noqa: E402
+from simulator import WalkerSimulator  # noqa: E402
+
+
+def analyze(timestamps, counts, model, block):
+    analyzer = GaitAnalyzer()
+    cycles = []
+    start = time.perf_counter()
+    for first in range(0, len(timestamps), block):
+        cycles.append(analyzer.add_samples(timestamps[first:first + block],
+                                           model.apply(counts[first:first + block])))
+    elapsed = time.perf_counter() - start
+    return np.sort(np.concatenate(cycles), order=('start', 'pad')), analyzer, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Online gait analysis benchmark")
+    parser.add_argument('--rate', type=float, default=1000.0, help="samples per second")
+    parser.add_argument('--block', type=int, default=50, help="samples per block from the reader")
+    parser.add_argument('--minutes', type=float, default=10.0)
+    args = parser.parse_args()
+
+    simulator = WalkerSimulator(rate=args.rate, seed=0)
+    n = int(args.minutes * 60 * args.rate)
+    counts = simulator.samples(0, n)
+    timestamps = np.arange(n) / args.rate
+    model = CalibrationModel(simulator.gains, simulator.baseline)
+
+    cycles, analyzer, elapsed = analyze(timestamps, counts, model, args.block)
+    seconds = n / args.rate
+    print(f"{n} samples in blocks of {args.block}: {elapsed:.2f} s, {n / elapsed:,.0f} samples/s, "
+          f"{elapsed / seconds:.2%} of one core at {args.rate:g} Hz")
+    print(analyzer.summary())
+    expected = 4 * int(seconds * simulator.cadence)
+    print(f"{len(cycles)} cycles, expected about {expected}")
+
+    whole, _, _ = analyze(timestamps, counts, model, n)
+    same = len(whole) == len(cycles) and all(np.allclose(whole[field], cycles[field])
+                                             for field in ('pad', 'start', 'duration', 'peak', 'impulse'))
+    print("same cycles as one block" if same else "DIFFERENT cycles from one block")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+# What the BLE hand dynamometer loop costs the serial path: one simulated walker read at full rate, first
+# alone and then with two fake dynamometers notifying on their asyncio loop thread. Compares the
+# intervals between sample blocks reaching the consumer (the serial path's latency), drops and the
+# process CPU load. The CPU figure includes the simulated devices themselves.
+#
+#   python benchmarks/bench_hand_ble.py --rate 1000 --hand-rate 100 --seconds 10
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from acquisition import AcquisitionWorker  # noqa: E402
+from hand_dynamometer import HAND_SIDES, FakeHandDevice, HandAcquisition  # noqa: E402
+from simulator import SimulatedSerial, WalkerSimulator  # noqa: E402
+
+
+def run(rate, hand_rate, seconds, with_hands):
+    port = SimulatedSerial(WalkerSimulator(rate=rate, mode='binary', startup_delay=0.0), baud=500000,
+                           buffer_limit=4096)
+    arrivals = []
+    received = [0]
+
+    def on_samples(timestamps, values):
+        arrivals.append(time.monotonic())
+        received[0] += len(timestamps)
+
+    hand_rows = {side: 0 for side in HAND_SIDES}
+
+    def on_hand_samples(side, rows):
+        hand_rows[side] += len(rows)
+
+    worker = AcquisitionWorker(port, on_samples).start()
+    hand = None
+    if with_hands:
+        devices = {side: FakeHandDevice(side, rate=hand_rate) for side in HAND_SIDES}
+        hand = HandAcquisition(devices, on_hand_samples, clock=worker.clock).start()
+    time.sleep(1.0)  # Handshake and connections
+    arrivals.clear()
+    cpu_start = time.process_time()
+    time.sleep(seconds)
+    cpu = time.process_time() - cpu_start
+    intervals = np.diff(arrivals) * 1e3
+    worker.stop()
+    if hand is not None:
+        hand.stop()
+    lost = port.simulator.samples_skipped + worker.parse_failures
+    if worker.frame_decoder is not None:
+        lost += worker.frame_decoder.lost_frames
+    label = f"with 2 hands at {hand_rate:g} Hz" if with_hands else "serial only"
+    print(f"{label:>24}: CPU {cpu / seconds:5.1%} | block interval p50 {np.percentile(intervals, 50):5.1f} ms "
+          f"p99 {np.percentile(intervals, 99):5.1f} ms max {intervals.max():5.1f} ms | "
+          f"overrun {port.overrun_bytes} B lost {lost}"
+          + (f" | hand rows {sum(hand_rows.values())}, lost {sum(hand.lost.values())}" if hand else ""))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="BLE hand dynamometer overhead on the serial path")
+    parser.add_argument('--rate', type=float, default=1000.0, help="walker samples per second")
+    parser.add_argument('--hand-rate', type=float, default=100.0, help="notifications per second per hand")
+    parser.add_argument('--seconds', type=float, default=10.0)
+    args = parser.parse_args()
+    run(args.rate, args.hand_rate, args.seconds, with_hands=False)
+    run(args.rate, args.hand_rate, args.seconds, with_hands=True)
+
+
+if __name__ == '__main__':
+    main()
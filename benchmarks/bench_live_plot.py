@@ -0,0 +1,72 @@
+# Per-frame cost of the live view (decimate + blit of the four lines) at different sample rates.
+# Renders off-screen with Agg, so it runs without a display.
+#
+#   python benchmarks/bench_live_plot.py --window 10 --frames 200
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from live_plot import SampleWindow, minmax_decimate  # noqa: E402
+from sample_buffer import CHANNEL_NAMES  # noqa: E402
+
+RATES_HZ = (80, 1000, 5000)
+
+
+def bench_rate(rate, window_seconds, frames, fps):
+    figure = Figure(figsize=(6, 4), dpi=100)
+    canvas = FigureCanvasAgg(figure)
+    ax = figure.add_subplot(111)
+    ax.set_xlim(-window_seconds, 0)
+    ax.set_ylim(-1.5, 1.5)
+    lines = [ax.plot([], [], label=name, animated=True)[0] for name in CHANNEL_NAMES]
+    canvas.draw()
+    background = canvas.copy_from_bbox(ax.bbox)
+
+    n = int(rate * window_seconds)
+    samples = SampleWindow(capacity=max(n, 1024))
+    per_frame = max(int(rate / fps), 1)
+    # Pre-fill one window of data
+    timestamps = np.arange(n) / rate
+    samples.add(timestamps, np.sin(timestamps)[:, None] * np.ones(4))
+    t = n / rate
+
+    cpu_start = time.thread_time()
+    for _ in range(frames):
+        timestamps = t + np.arange(per_frame) / rate
+        samples.add(timestamps, np.sin(timestamps)[:, None] * np.ones(4))
+        t += per_frame / rate
+
+        window_t, window_v = samples.since(samples.latest_time() - window_seconds)
+        x, y = minmax_decimate(window_t, window_v, int(ax.bbox.width))
+        x = x - window_t[-1]
+        canvas.restore_region(background)
+        for line, column in zip(lines, y.T):
+            line.set_data(x, column)
+            ax.draw_artist(line)
+        canvas.blit(ax.bbox)
+    return (time.thread_time() - cpu_start) / frames, len(x)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Live plot render benchmark")
+    parser.add_argument('--window', type=float, default=10.0, help="seconds shown (default: 10)")
+    parser.add_argument('--frames', type=int, default=200)
+    parser.add_argument('--fps', type=int, default=20)
+    args = parser.parse_args()
+
+    for rate in RATES_HZ:
+        per_frame, points = bench_rate(rate, args.window, args.frames, args.fps)
+        print(f"{rate:>6} Hz: {per_frame * 1e3:6.2f} ms/frame, {points:5d} points/line, "
+              f"{per_frame * args.fps * 100:5.1f}% of one core at {args.fps} fps")
+
+
+if __name__ == '__main__':
+    main()
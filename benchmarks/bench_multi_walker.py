@@ -0,0 +1,72 @@
+# Several simulated walkers acquired in one process, each with its own reader thread, all on one
+# monotonic clock and streamed into one HDF5 file with a group per walker. Reports per-walker drops
+# and the process CPU load, to check that N walkers at full rate keep up. The CPU figure includes the
+# simulated devices themselves, which poll every millisecond on their readers' threads.
+#
+#   python benchmarks/bench_multi_walker.py --walkers 8 --rate 1000 --mode binary --seconds 10
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from acquisition import AcquisitionWorker  # noqa: E402
+from recording_file import StreamingH5Writer, load_recording  # noqa: E402
+from simulator import SimulatedSerial, WalkerSimulator  # noqa: E402
+
+
+def run(n_walkers, rate, mode, baud, seconds, directory):
+    filename = os.path.join(directory, 'multi.h5')
+    names = [f"walker{index + 1}" for index in range(n_walkers)]
+    writer = StreamingH5Writer(filename, attrs={'raw_counts': True},
+                               groups={name: {} for name in names}).open()
+    ports, workers = [], []
+    start = time.monotonic()
+    for name in names:
+        simulator = WalkerSimulator(rate=rate, mode=mode, startup_delay=0.0)
+        port = SimulatedSerial(simulator, baud=baud, buffer_limit=4096)  # Typical OS serial input buffer
+        stream = writer.stream(name)
+        workers.append(AcquisitionWorker(
+            port, lambda timestamps, values, stream=stream: stream.extend(timestamps - start, values)).start())
+        ports.append(port)
+    cpu_start = time.process_time()
+    time.sleep(seconds)
+    cpu = time.process_time() - cpu_start
+    for worker in workers:
+        worker.stop()
+    writer.close()
+
+    print(f"{n_walkers} walkers, {mode} at {rate:g} Hz, {baud} baud, {seconds:g} s: "
+          f"process CPU {cpu / seconds:.0%} of one core")
+    all_ok = True
+    for name, port, worker in zip(names, ports, workers):
+        data, _ = load_recording(filename, calibrated=False, group=name)
+        lost = port.simulator.samples_skipped + worker.parse_failures
+        if worker.frame_decoder is not None:
+            lost += worker.frame_decoder.lost_frames
+        # Samples still in flight on the link at the end of the run do not count as drops
+        ok = port.overrun_bytes == 0 and lost == 0 and len(data) >= 0.95 * port.simulator.samples_sent
+        all_ok &= ok
+        print(f"  {name}: sent {port.simulator.samples_sent:>7} saved {len(data):>7} overrun {port.overrun_bytes:>6} B "
+              f"lost {lost:>5} first {data.timestamps[0] if len(data) else float('nan'):.3f} s  "
+              f"{'ok' if ok else 'DROPS'}")
+    print("no drops" if all_ok else "DROPS")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-walker acquisition benchmark")
+    parser.add_argument('--walkers', type=int, default=8)
+    parser.add_argument('--rate', type=float, default=1000.0, help="samples per second per walker")
+    parser.add_argument('--mode', choices=('text', 'binary'), default='binary')
+    parser.add_argument('--baud', type=int, default=500000)
+    parser.add_argument('--seconds', type=float, default=10.0)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as directory:
+        run(args.walkers, args.rate, args.mode, args.baud, args.seconds, directory)
+
+
+if __name__ == '__main__':
+    main()
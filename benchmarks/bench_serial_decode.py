@@ -0,0 +1,52 @@
+# Decode cost per sample: text lines (readline/decode/split/float) vs. binary frames (np.frombuffer)
+#
+#   python benchmarks/bench_serial_decode.py --samples 200000
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from serial_protocol import FrameDecoder, encode_frames, parse_text_line, FRAME_SIZE  # noqa: E402
+
+
+def bench_text(values):
+    lines = [(",".join(str(v) for v in row) + "\r\n").encode() for row in values]
+    start = time.perf_counter()
+    for raw in lines:
+        parse_text_line(raw.decode().strip())
+    return time.perf_counter() - start, sum(len(line) for line in lines)
+
+
+def bench_binary(values, block_frames):
+    stream = encode_frames(np.arange(len(values)), values)
+    block = block_frames * FRAME_SIZE
+    decoder = FrameDecoder()
+    start = time.perf_counter()
+    for pos in range(0, len(stream), block):
+        decoder.feed(stream[pos:pos + block])
+    return time.perf_counter() - start, len(stream)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serial decode benchmark")
+    parser.add_argument('--samples', type=int, default=200000)
+    parser.add_argument('--block', type=int, default=256, help="frames per binary read (default: 256)")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    values = rng.integers(-8388608, 8388607, size=(args.samples, 4))
+
+    for label, (elapsed, n_bytes) in (('text', bench_text(values)),
+                                      ('binary', bench_binary(values, args.block))):
+        per_sample = elapsed / args.samples
+        print(f"{label:>6}: {per_sample * 1e6:8.2f} us/sample  {1 / per_sample:12.0f} samples/s max  "
+              f"{n_bytes / args.samples:5.1f} bytes/sample")
+
+
+if __name__ == '__main__':
+    main()
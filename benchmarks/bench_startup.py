@@ -0,0 +1,57 @@
+# Startup cost of each mode: wall time of a fresh interpreter importing what the mode needs before it
+# can start acquiring. "gui (eager)" is what the app loaded up front before pandas, matplotlib and the
+# live view became lazy; "headless" never loads tkinter, PIL, pandas or matplotlib at all.
+#
+#   python benchmarks/bench_startup.py --runs 5
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODES = {
+    'headless': "import forcewalker, headless, recording_file",
+    'gui': "import forcewalker, tkinter, gui",
+    'gui (eager)': ("import forcewalker, tkinter, gui, pandas, matplotlib; matplotlib.use('TkAgg'); "
+                    "import matplotlib.pyplot, live_plot"),
+}
+HEAVY_MODULES = ('tkinter', 'PIL', 'pandas', 'matplotlib', 'h5py', 'serial')
+
+PROBE = """
+import sys, time
+start = time.perf_counter()
+{statement}
+print(time.perf_counter() - start, ','.join(m for m in {heavy!r} if m in sys.modules))
+"""
+
+
+def measure(statement, runs):
+    imports, walls = [], []
+    loaded = ''
+    for _ in range(runs):
+        start = time.perf_counter()
+        out = subprocess.run([sys.executable, '-c', PROBE.format(statement=statement, heavy=HEAVY_MODULES)],
+                             cwd=ROOT, capture_output=True, text=True, check=True).stdout.split()
+        walls.append(time.perf_counter() - start)
+        imports.append(float(out[0]))
+        loaded = out[1] if len(out) > 1 else ''
+    return statistics.median(imports), statistics.median(walls), loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Startup time per mode")
+    parser.add_argument('--runs', type=int, default=5, help="fresh interpreters per mode (median is shown)")
+    args = parser.parse_args()
+
+    for mode, statement in MODES.items():
+        import_time, wall, loaded = measure(statement, args.runs)
+        print(f"{mode:>12}: imports {import_time * 1e3:6.0f} ms, process {wall * 1e3:6.0f} ms  "
+              f"[{loaded or 'no heavy modules'}]")
+
+
+if __name__ == '__main__':
+    main()
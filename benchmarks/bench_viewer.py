@@ -0,0 +1,79 @@
+# Opening and zooming a long recording in the viewer, which reads only the pyramid level that fits
+# the plot, against loading and plotting every sample. Renders off-screen with Agg.
+#
+#   python benchmarks/bench_viewer.py --minutes 60 --rate 1000
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt  # noqa: E402
+import numpy as np  # noqa: E402
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from recording_file import StreamingH5Writer, load_recording  # noqa: E402
+from recording_viewer import RecordingViewer  # noqa: E402
+from simulator import WalkerSimulator  # noqa: E402
+
+SPANS_S = (3600, 600, 60, 5)
+
+
+def write_session(filename, minutes, rate):
+    simulator = WalkerSimulator(rate=rate, seed=0)
+    writer = StreamingH5Writer(filename, attrs={'raw_counts': False}).open()
+    block = int(rate * 0.05)
+    values = simulator.samples(0, block)
+    for first in range(0, int(minutes * 60 * rate), block):
+        writer.extend((first + np.arange(block)) / rate, values)
+    writer.close()
+
+
+def bench_full_plot(filename):
+    start = time.perf_counter()
+    data, _ = load_recording(filename)
+    figure, ax = plt.subplots(figsize=(10, 6))
+    for index in range(data.values.shape[1]):
+        ax.plot(data.timestamps, data.values[:, index])
+    figure.canvas.draw()
+    elapsed = time.perf_counter() - start
+    plt.close(figure)
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recording viewer benchmark")
+    parser.add_argument('--minutes', type=float, default=60.0)
+    parser.add_argument('--rate', type=float, default=1000.0)
+    parser.add_argument('--skip-full', action='store_true', help="skip the slow every-sample baseline")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, 'session.h5')
+        write_session(filename, args.minutes, args.rate)
+        print(f"{args.minutes:g} min @ {args.rate:g} Hz, {os.path.getsize(filename) / 1e6:.0f} MB")
+        if not args.skip_full:
+            print(f"  every sample: open {bench_full_plot(filename):6.2f} s")
+        start = time.perf_counter()
+        viewer = RecordingViewer(filename)
+        viewer.figure.canvas.draw()
+        print(f"  pyramid:      open {time.perf_counter() - start:6.2f} s")
+        t0, t1 = viewer.view.time_range
+        for span in SPANS_S:
+            if span > t1 - t0:
+                continue
+            middle = (t0 + t1 - span) / 2
+            start = time.perf_counter()
+            viewer.ax.set_xlim(middle, middle + span)
+            viewer.figure.canvas.draw()
+            points = len(viewer.lines[0].get_xdata())
+            print(f"    zoom to {span:>5g} s: {(time.perf_counter() - start) * 1e3:6.0f} ms ({points} points/line)")
+        viewer.view.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,168 @@
+import numpy as np
+
+
+class RunningStats:
+    # Per-channel running mean and variance (Welford), updated a block at a time using
+    # Chan's parallel combination so each block costs one vectorized mean/variance.
+
+    def __init__(self, n_channels=4):
+        self.count = 0
+        self.mean = np.zeros(n_channels)
+        self._m2 = np.zeros(n_channels)
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        n = len(values)
+        if n == 0:
+            return
+        block_mean = values.mean(axis=0)
+        block_m2 = ((values - block_mean) ** 2).sum(axis=0)
+        total = self.count + n
+        delta = block_mean - self.mean
+        self.mean = self.mean + delta * (n / total)
+        self._m2 = self._m2 + block_m2 + delta ** 2 * (self.count * n / total)
+        self.count = total
+
+    @property
+    def variance(self):
+        return self._m2 / (self.count - 1) if self.count > 1 else np.zeros_like(self._m2)
+
+    @property
+    def std(self):
+        return np.sqrt(self.variance)
+
+
+class StreamWindow:
+    # Collects statistics over `duration` seconds of the sample stream.
+    # Fed through add_samples(timestamps, values) like any other stream consumer; can be cancelled.
+    # The window is rejected as unstable if any channel's standard deviation exceeds max_std, or its
+    # mean drifts by more than max_drift between the first and second half of the window.
+
+    def __init__(self, duration, max_std=None, max_drift=None, n_channels=4):
+        self.duration = duration
+        self.max_std = max_std
+        self.max_drift = max_drift
+        self.stats = RunningStats(n_channels)
+        self._halves = (RunningStats(n_channels), RunningStats(n_channels))
+        self.start_time = None
+        self.elapsed = 0.0
+        self.is_done = False
+        self.is_cancelled = False
+
+    @property
+    def progress(self):
+        return min(self.elapsed / self.duration, 1.0) if self.duration else 1.0
+
+    def cancel(self):
+        self.is_cancelled = True
+        self.is_done = True
+
+    def add_samples(self, timestamps, values):
+        if self.is_done or not len(timestamps):
+            return
+        if self.start_time is None:
+            self.start_time = timestamps[0]
+        offsets = np.asarray(timestamps) - self.start_time
+        inside = offsets < self.duration
+        values = np.asarray(values)[inside]
+        offsets = offsets[inside]
+        self.stats.update(values)
+        first_half = offsets < self.duration / 2
+        self._halves[0].update(values[first_half])
+        self._halves[1].update(values[~first_half])
+        self.elapsed = timestamps[-1] - self.start_time
+        if self.elapsed >= self.duration:
+            self.is_done = True
+
+    @property
+    def mean(self):
+        return self.stats.mean
+
+    @property
+    def drift(self):
+        first, second = self._halves
+        if not first.count or not second.count:
+            return np.zeros_like(self.stats.mean)
+        return np.abs(second.mean - first.mean)
+
+    def instability(self):
+        # Human readable reason the window was rejected, or None if it is usable
+        if self.stats.count < 2:
+            return "no samples received"
+        if self.max_std is not None and np.any(self.stats.std > self.max_std):
+            return f"too noisy (std {np.array2string(self.stats.std, precision=1)})"
+        if self.max_drift is not None and np.any(self.drift > self.max_drift):
+            return f"load drifted (by {np.array2string(self.drift, precision=1)})"
+        return None
+
+
+def fit_linear_calibration(weights, means, tare_values=None):
+    # Per-channel least-squares fit of counts = gain * weight + offset over all calibration points.
+    # weights: (P,) grams; means: (P, channels) mean counts. With a single point the line is anchored
+    # at the tare values instead. Returns (gains, offsets), so force = (counts - offsets) / gains.
+    weights = np.asarray(weights, dtype=np.float64)
+    means = np.asarray(means, dtype=np.float64).reshape(len(weights), -1)
+    if len(np.unique(weights)) < 2:
+        offsets = np.zeros(means.shape[1]) if tare_values is None else np.asarray(tare_values, dtype=np.float64)
+        gains = (means.mean(axis=0) - offsets) / weights.mean()
+        return gains, offsets
+    design = np.column_stack((weights, np.ones_like(weights)))
+    (gains, offsets), *_ = np.linalg.lstsq(design, means, rcond=None)
+    return gains, offsets
+
+
+CALIBRATION_SCHEMA = 1
+# Factory scaling in counts per gram, used until the walker has been calibrated
+DEFAULT_GAINS = (72750 / 1100, 50000 / 1100, 83000 / 1100, 48000 / 1100)
+
+
+class CalibrationModel:
+    # Per-channel affine model: force = (counts - offsets) / gains.
+    # Recordings keep raw counts and store this model next to them, so calibrated values are computed
+    # on demand and a finished session can be re-calibrated by swapping the model.
+    # Models are never modified in place; updated() returns a new one with the next revision number.
+
+    def __init__(self, gains, offsets, revision=0, points=()):
+        self.gains = np.asarray(gains, dtype=np.float64)
+        self.offsets = np.asarray(offsets, dtype=np.float64)
+        self.revision = revision
+        self.points = tuple((float(weight), np.asarray(counts, dtype=np.float64)) for weight, counts in points)
+
+    @classmethod
+    def default(cls):
+        return cls(DEFAULT_GAINS, np.zeros(len(DEFAULT_GAINS)))
+
+    def updated(self, gains=None, offsets=None, points=None):
+        return CalibrationModel(self.gains if gains is None else gains,
+                                self.offsets if offsets is None else offsets,
+                                self.revision + 1,
+                                self.points if points is None else points)
+
+    def apply(self, counts):
+        # One vectorized transform over a whole (N, channels) block
+        return (np.asarray(counts, dtype=np.float64) - self.offsets) / self.gains
+
+    def to_attrs(self):
+        attrs = {
+            'calibration_schema': CALIBRATION_SCHEMA,
+            'calibration_revision': self.revision,
+            'calibration_gains': self.gains,
+            'calibration_offsets': self.offsets,
+        }
+        if self.points:
+            attrs['calibration_point_weights'] = np.array([weight for weight, _ in self.points])
+            attrs['calibration_point_counts'] = np.vstack([counts for _, counts in self.points])
+        return attrs
+
+    @classmethod
+    def from_attrs(cls, attrs):
+        # None for files written before calibration models were stored
+        if 'calibration_schema' not in attrs:
+            return None
+        if int(attrs['calibration_schema']) > CALIBRATION_SCHEMA:
+            raise ValueError(f"Calibration schema {attrs['calibration_schema']} is newer than this application")
+        points = ()
+        if 'calibration_point_weights' in attrs:
+            points = zip(attrs['calibration_point_weights'], attrs['calibration_point_counts'])
+        return cls(attrs['calibration_gains'], attrs['calibration_offsets'],
+                   int(attrs['calibration_revision']), points)
@@ -0,0 +1,288 @@
+import argparse
+import glob
+import json
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import h5py
+import numpy as np
+
+from calibration import CalibrationModel, RunningStats
+from recording_file import is_recording_node, read_samples, recording_length
+from sample_buffer import CHANNELS
+
+CATALOG_NAME = 'catalog.sqlite'  # One catalog per recordings directory, next to the files
+STATS = ('mean', 'std', 'min', 'max')
+# One row per recording, or per walker of a multi-walker recording (walker '' for single walker files)
+SESSION_COLUMNS = (
+    ('file', 'TEXT NOT NULL'),  # Relative to the catalog's directory, so the folder can be moved
+    ('walker', "TEXT NOT NULL DEFAULT ''"),
+    ('mtime', 'REAL'),
+    ('size', 'INTEGER'),
+    ('start_time', 'REAL'),  # Wall clock (time.time()) at the start of the recording
+    ('stop_time', 'REAL'),
+    ('duration', 'REAL'),  # Seconds from the first to the last sample
+    ('n_samples', 'INTEGER'),
+    ('rate', 'REAL'),  # Effective samples per second
+    ('device', 'TEXT'),
+    ('headless', 'INTEGER'),
+    ('layout', 'TEXT'),
+    ('raw_counts', 'INTEGER'),
+    ('calibration_revision', 'INTEGER'),
+    ('calibration_gains', 'TEXT'),  # JSON lists, rr rf lr lf
+    ('calibration_offsets', 'TEXT'),
+    ('n_gaps', 'INTEGER'),
+    ('gap_seconds', 'REAL'),
+    ('n_cycles', 'INTEGER'),
+    ('left_share', 'REAL'),
+    ('front_share', 'REAL'),
+) + tuple((f'{key}_{stat}', 'REAL') for key in CHANNELS for stat in STATS)  # Grams
+COLUMN_NAMES = tuple(name for name, _ in SESSION_COLUMNS)
+
+
+def catalog_filename(directory='Data'):
+    return os.path.join(directory, CATALOG_NAME)
+
+
+def _optional(attrs, name, kind):
+    return kind(attrs[name]) if name in attrs else None
+
+
+def scan_stats(node, model, block_rows=1 << 20):
+    # Per-channel mean, std, min and max in grams by reading the samples, for files recorded before
+    # the writer kept them
+    stats = RunningStats(len(CHANNELS))
+    minimum = np.full(len(CHANNELS), np.inf)
+    maximum = np.full(len(CHANNELS), -np.inf)
+    n = recording_length(node)
+    for start in range(0, n, block_rows):
+        _, values = read_samples(node, start, min(start + block_rows, n))
+        if model is not None:
+            values = model.apply(values)
+        stats.update(values)
+        minimum = np.minimum(minimum, values.min(axis=0))
+        maximum = np.maximum(maximum, values.max(axis=0))
+    if not stats.count:
+        return None
+    return stats.mean, stats.std, minimum, maximum
+
+
+def stored_stats(attrs, model):
+    # The writer's stats_* attributes (stored units) converted to grams; None if the file has none
+    if 'stats_mean' not in attrs:
+        return None
+    mean, std, low, high = (np.asarray(attrs[f'stats_{stat}'], dtype=np.float64) for stat in STATS)
+    if model is None:
+        return mean, std, low, high
+    low, high = model.apply(low[None, :])[0], model.apply(high[None, :])[0]
+    # A negative gain swaps the ends
+    return model.apply(mean[None, :])[0], std / np.abs(model.gains), np.minimum(low, high), np.maximum(low, high)
+
+
+def describe_node(node, attrs):
+    # Catalog fields of one recording or walker group; reads attributes and two timestamps only,
+    # unless the file predates the stored stats
+    n = recording_length(node)
+    model = CalibrationModel.from_attrs(attrs) if attrs.get('raw_counts', False) else None
+    row = {
+        'start_time': _optional(attrs, 'start_time', float),
+        'stop_time': _optional(attrs, 'stop_time', float),
+        'n_samples': n,
+        'device': _optional(attrs, 'device', str),
+        'headless': int(bool(attrs.get('headless', False))),
+        'layout': str(attrs.get('layout', 'channels')),
+        'raw_counts': int(bool(attrs.get('raw_counts', False))),
+        'calibration_revision': None if model is None else model.revision,
+        'calibration_gains': None if model is None else json.dumps(model.gains.tolist()),
+        'calibration_offsets': None if model is None else json.dumps(model.offsets.tolist()),
+        'n_cycles': len(node['cycles']) if 'cycles' in node else None,
+        'left_share': _optional(attrs, 'gait_left_share', float),
+        'front_share': _optional(attrs, 'gait_front_share', float),
+    }
+    duration = 0.0
+    if n:
+        first, _ = read_samples(node, 0, 1)
+        last, _ = read_samples(node, n - 1, n)
+        duration = float(last[0] - first[0])
+    row['duration'] = duration
+    row['rate'] = (n - 1) / duration if duration > 0 else None
+    gaps = node['gaps'][:] if 'gaps' in node else np.empty((0, 2))
+    row['n_gaps'] = len(gaps)
+    row['gap_seconds'] = float((gaps[:, 1] - gaps[:, 0]).sum()) if len(gaps) else 0.0
+    stats = stored_stats(attrs, model) or scan_stats(node, model)
+    for stat, values in zip(STATS, stats or [[None] * len(CHANNELS)] * len(STATS)):
+        for key, value in zip(CHANNELS, values):
+            row[f'{key}_{stat}'] = None if value is None else float(value)
+    return row
+
+
+def describe_recording(filename, directory=None):
+    # Catalog rows for a recording file: one, or one per walker group
+    directory = directory or os.path.dirname(filename)
+    stat = os.stat(filename)
+    rows = []
+    with h5py.File(filename, 'r') as f:
+        file_attrs = dict(f.attrs)
+        if is_recording_node(f):
+            nodes = [('', f)]
+        else:
+            nodes = [(name, item) for name, item in f.items()
+                     if isinstance(item, h5py.Group) and is_recording_node(item)]
+        for walker, node in nodes:
+            attrs = dict(file_attrs)
+            attrs.update(node.attrs)
+            row = describe_node(node, attrs)
+            row.update(file=os.path.relpath(filename, directory), walker=walker, mtime=stat.st_mtime,
+                       size=stat.st_size)
+            rows.append(row)
+    return rows
+
+
+class SessionCatalog:
+    # SQLite index of the recordings in one directory, so sessions can be listed, filtered and compared
+    # without opening any HDF5 file. A recording is added when it is saved (add_recording); files
+    # recorded before the catalog existed, or copied in from elsewhere, are added by backfill(), which
+    # describes them on several cores.
+
+    def __init__(self, filename=None, directory='Data'):
+        self.filename = filename or catalog_filename(directory)
+        self.directory = os.path.dirname(os.path.abspath(self.filename))
+        os.makedirs(self.directory, exist_ok=True)
+        self.connection = sqlite3.connect(self.filename, timeout=10.0)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute('PRAGMA journal_mode=WAL')  # The GUI can add while a query runs
+        columns = ', '.join(f'{name} {kind}' for name, kind in SESSION_COLUMNS)
+        with self.connection:
+            self.connection.execute(f'CREATE TABLE IF NOT EXISTS sessions ({columns}, PRIMARY KEY (file, walker))')
+            self.connection.execute('CREATE INDEX IF NOT EXISTS sessions_start ON sessions (start_time)')
+            self.connection.execute('CREATE INDEX IF NOT EXISTS sessions_device ON sessions (device)')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.connection.close()
+
+    def add_rows(self, rows):
+        placeholders = ', '.join('?' * len(COLUMN_NAMES))
+        with self.connection:
+            self.connection.executemany(
+                f'INSERT OR REPLACE INTO sessions ({", ".join(COLUMN_NAMES)}) VALUES ({placeholders})',
+                [tuple(row.get(name) for name in COLUMN_NAMES) for row in rows])
+
+    def add_recording(self, filename):
+        self.remove(filename)  # A re-described file may have lost groups
+        rows = describe_recording(filename, self.directory)
+        self.add_rows(rows)
+        return rows
+
+    def remove(self, filename):
+        with self.connection:
+            self.connection.execute('DELETE FROM sessions WHERE file = ?', (os.path.relpath(filename, self.directory),))
+
+    def stale_files(self, pattern='*.h5'):
+        # Recordings in the directory that are new or changed since they were cataloged
+        known = {row['file']: (row['mtime'], row['size'])
+                 for row in self.connection.execute('SELECT file, mtime, size FROM sessions')}
+        stale = []
+        for filename in sorted(glob.glob(os.path.join(self.directory, pattern))):
+            stat = os.stat(filename)
+            if known.get(os.path.relpath(filename, self.directory)) != (stat.st_mtime, stat.st_size):
+                stale.append(filename)
+        return stale
+
+    def remove_missing(self):
+        files = [row['file'] for row in self.connection.execute('SELECT DISTINCT file FROM sessions')]
+        missing = [file for file in files if not os.path.exists(os.path.join(self.directory, file))]
+        with self.connection:
+            self.connection.executemany('DELETE FROM sessions WHERE file = ?', [(file,) for file in missing])
+        return missing
+
+    def backfill(self, pattern='*.h5', workers=None, progress=None):
+        # Describe new and changed recordings in a process pool; only this process writes the catalog.
+        # progress(filename, error or None) is called as each one finishes. Returns the failures.
+        stale = self.stale_files(pattern)
+        failures = {}
+        if not stale:
+            return failures
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(describe_recording, filename, self.directory): filename for filename in stale}
+            for future in as_completed(futures):
+                filename = futures[future]
+                try:
+                    rows = future.result()
+                except Exception as e:  # Not a recording, or damaged; left out of the catalog
+                    failures[filename] = e
+                else:
+                    self.remove(filename)
+                    self.add_rows(rows)
+                if progress is not None:
+                    progress(filename, failures.get(filename))
+        return failures
+
+    def query(self, where=None, params=(), order_by='start_time'):
+        # Rows as dicts, e.g. query('device = ? AND duration > ?', ('COM3', 3600))
+        sql = 'SELECT * FROM sessions'
+        if where:
+            sql += f' WHERE {where}'
+        if order_by:
+            sql += f' ORDER BY {order_by}'
+        return [dict(row) for row in self.connection.execute(sql, params)]
+
+
+def add_to_catalog(filename):
+    # Called when a recording is saved. The catalog is only an index, so a failure is reported and the
+    # recording is unaffected; backfill picks the file up later.
+    try:
+        with SessionCatalog(catalog_filename(os.path.dirname(filename) or '.')) as catalog:
+            catalog.add_recording(filename)
+    except Exception as e:
+        print("Could not add to the session catalog:", e)
+
+
+def format_session(row):
+    start = time.strftime('%Y-%m-%d %H:%M', time.localtime(row['start_time'])) if row['start_time'] else '?'
+    walker = f" [{row['walker']}]" if row['walker'] else ""
+    rate = f"{row['rate']:.0f} Hz" if row['rate'] else "- Hz"
+    peaks = ' '.join(f"{key} {row[f'{key}_max']:.0f}" for key in CHANNELS if row[f'{key}_max'] is not None)
+    return (f"{start}  {row['file']}{walker}  {row['duration'] / 60:.1f} min  {row['n_samples']} samples  "
+            f"{rate}  {row['device'] or ''}  max g: {peaks}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Catalog of walker recordings")
+    parser.add_argument('--directory', default='Data', help="recordings directory (default: Data)")
+    parser.add_argument('--backfill', action='store_true', help="add new and changed recordings first")
+    parser.add_argument('--workers', type=int, default=None, help="backfill processes (default: one per core)")
+    parser.add_argument('--where', default=None,
+                        help="SQL filter, e.g. \"duration > 3600 AND device = 'COM3'\"")
+    parser.add_argument('--since', default=None, help="only sessions started on or after YYYY-MM-DD")
+    args = parser.parse_args()
+
+    with SessionCatalog(directory=args.directory) as catalog:
+        if args.backfill:
+            missing = catalog.remove_missing()
+            failures = catalog.backfill(workers=args.workers,
+                                        progress=lambda filename, error: print(
+                                            f"{filename}: {'failed: ' + str(error) if error else 'added'}"))
+            print(f"{len(missing)} missing removed, {len(failures)} failed")
+        clauses, params = [], []
+        if args.where:
+            clauses.append(f'({args.where})')
+        if args.since:
+            clauses.append('start_time >= ?')
+            params.append(time.mktime(time.strptime(args.since, '%Y-%m-%d')))
+        for row in catalog.query(' AND '.join(clauses) or None, params):
+            print(format_session(row))
+    return 0
+
+
+if __name__ == '__main__':
+    import multiprocessing
+    multiprocessing.freeze_support()  # Worker processes of a frozen (PyInstaller) build
+    raise SystemExit(main())
@@ -0,0 +1,239 @@
+import argparse
+import glob
+import importlib
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import h5py
+import numpy as np
+
+from calibration import CalibrationModel
+from hand_dynamometer import HAND_CHANNEL_NAMES, HAND_FIELDS, HAND_SHEETS, HAND_SIDES, hand_at, read_hand_tables
+from recording_file import read_samples, recording_groups, recording_length
+from sample_buffer import CHANNEL_NAMES
+
+EXPORT_FORMATS = ('csv', 'parquet', 'feather', 'xlsx')
+EXCEL_MAX_SAMPLES = 1048575  # Excel's 1,048,576 rows per sheet, minus the header
+EXCEL_SHEETS = ('RR', 'RF', 'LR', 'LF')
+COLUMNS = ('Timestamp',) + CHANNEL_NAMES
+
+
+def csv_row_format(n_values):
+    # Microsecond timestamps; forces to 0.1 mg, far below the load cell noise
+    return '%.6f' + ',%.4f' * n_values + '\n'
+
+
+class ExportCancelled(Exception):
+    pass
+
+
+def export_filename(filename, fmt, group=None):
+    # Next to the recording: Data/FW_<date>.h5 -> Data/FW_<date>.csv, or FW_<date>_walker2.csv
+    stem = os.path.splitext(filename)[0]
+    return f"{stem}_{group}.{fmt}" if group else f"{stem}.{fmt}"
+
+
+def calibrated_blocks(node, attrs, chunk_rows):
+    # (timestamps, values in grams) in blocks of chunk_rows, so memory does not grow with the session
+    model = CalibrationModel.from_attrs(attrs) if attrs.get('raw_counts', False) else None
+    n = recording_length(node)
+    for start in range(0, n, chunk_rows):
+        timestamps, values = read_samples(node, start, min(start + chunk_rows, n))
+        yield start + len(timestamps), n, timestamps, values if model is None else model.apply(values)
+
+
+def with_hand_columns(blocks, tables):
+    # Hand dynamometer channels appended to each block, at the walker's sample times
+    for done, total, timestamps, values in blocks:
+        yield done, total, timestamps, np.column_stack((values, hand_at(tables, timestamps)))
+
+
+def _require(module, fmt):
+    # Parquet and Feather are optional: pyarrow is only needed when they are chosen
+    try:
+        return importlib.import_module(module)
+    except ImportError as e:
+        package = module.split('.')[0]
+        raise ImportError(f"{fmt} export needs {package} (pip install {package})") from e
+
+
+def _write_csv(output, blocks, report, columns):
+    # One %-format over a whole block is several times faster than DataFrame.to_csv or np.savetxt
+    row_format = csv_row_format(len(columns) - 1)
+    with open(output, 'w', newline='') as f:
+        f.write(','.join(columns) + '\n')
+        for done, total, timestamps, values in blocks:
+            rows = np.column_stack((timestamps, values))
+            f.write((row_format * len(rows)) % tuple(rows.ravel().tolist()))
+            report(done, total)
+
+
+def _write_arrow(output, blocks, report, fmt, columns):
+    pa = _require('pyarrow', fmt)
+    schema = pa.schema([(name, pa.float64()) for name in columns])
+    if fmt == 'parquet':
+        writer = _require('pyarrow.parquet', fmt).ParquetWriter(output, schema, compression='zstd')
+    else:
+        # Feather v2 is the Arrow IPC file format, which can be written a record batch at a time
+        writer = pa.ipc.new_file(output, schema)
+    with writer:
+        for done, total, timestamps, values in blocks:
+            columns = [timestamps] + [values[:, index] for index in range(values.shape[1])]
+            batch = pa.record_batch([pa.array(column) for column in columns], schema=schema)
+            if fmt == 'parquet':
+                writer.write_batch(batch)
+            else:
+                writer.write(batch)
+            report(done, total)
+
+
+def _write_excel(output, blocks, report, n, hand):
+    # Same workbook as before: a sheet per load cell, then a sheet per hand channel with the hand's own
+    # timestamps. Excel needs the whole sheet, so it is only offered for sessions that fit on one.
+    if n > EXCEL_MAX_SAMPLES:
+        raise ValueError(f"{n} samples do not fit in an Excel sheet ({EXCEL_MAX_SAMPLES} rows), "
+                         "export to CSV or Parquet instead")
+    import pandas as pd
+    parts = [(timestamps, values) for _, _, timestamps, values in blocks]
+    timestamps = np.concatenate([part[0] for part in parts]) if parts else np.empty(0)
+    values = np.concatenate([part[1] for part in parts]) if parts else np.empty((0, len(CHANNEL_NAMES)))
+    with pd.ExcelWriter(output) as writer:
+        for index, (sheet, name) in enumerate(zip(EXCEL_SHEETS, CHANNEL_NAMES)):
+            pd.DataFrame({'Timestamp': timestamps, name: values[:, index]}).to_excel(
+                writer, sheet_name=sheet, index=False)
+            report((index + 1) * n, len(EXCEL_SHEETS) * n)
+        for index, (sheet, name) in enumerate(zip(HAND_SHEETS, HAND_CHANNEL_NAMES)):
+            side, field = HAND_SIDES[index // len(HAND_FIELDS)], HAND_FIELDS[index % len(HAND_FIELDS)]
+            if side in hand:
+                pd.DataFrame({'Timestamp': hand[side]['time'], name: hand[side][field]}).to_excel(
+                    writer, sheet_name=sheet, index=False)
+
+
+def export_recording(filename, fmt, output=None, group=None, chunk_rows=1 << 18, progress=None, cancel=None):
+    # Export one recording (or one walker group) in calibrated units, reading it in chunks. Hand
+    # dynamometer channels recorded alongside are added as columns aligned to the walker's samples.
+    # progress(fraction) is called as it goes; setting the `cancel` event stops it and removes the
+    # partial output. Returns the output filename.
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format {fmt!r}, expected one of {', '.join(EXPORT_FORMATS)}")
+    output = output or export_filename(filename, fmt, group)
+
+    def report(done, total):
+        if cancel is not None and cancel.is_set():
+            raise ExportCancelled()
+        if progress is not None:
+            progress(done / total if total else 1.0)
+
+    with h5py.File(filename, 'r') as f:
+        node = f if group is None else f[group]
+        attrs = dict(f.attrs)
+        attrs.update(node.attrs)
+        blocks = calibrated_blocks(node, attrs, chunk_rows)
+        hand = read_hand_tables(f)
+        columns = COLUMNS
+        if hand and fmt != 'xlsx':
+            blocks = with_hand_columns(blocks, hand)
+            columns = COLUMNS + HAND_CHANNEL_NAMES
+        try:
+            if fmt == 'csv':
+                _write_csv(output, blocks, report, columns)
+            elif fmt == 'xlsx':
+                _write_excel(output, blocks, report, recording_length(node), hand)
+            else:
+                _write_arrow(output, blocks, report, fmt, columns)
+        except BaseException:
+            if os.path.exists(output):
+                os.remove(output)
+            raise
+    if progress is not None:
+        progress(1.0)
+    return output
+
+
+def export_file(filename, fmt, progress=None, cancel=None):
+    # Every walker of a recording, each to its own file; returns the output filenames
+    groups = recording_groups(filename) or [None]
+    outputs = []
+    for index, group in enumerate(groups):
+        def group_progress(fraction, index=index):
+            if progress is not None:
+                progress((index + fraction) / len(groups))
+        outputs.append(export_recording(filename, fmt, group=group, progress=group_progress, cancel=cancel))
+    return outputs
+
+
+class ExportJob:
+    # Runs export_file on a background thread so the GUI stays responsive. The GUI polls progress and
+    # is_done, like a tare window; outputs or error hold the result afterwards.
+
+    def __init__(self, filename, fmt):
+        self.filename = filename
+        self.fmt = fmt
+        self.progress = 0.0
+        self.outputs = []
+        self.error = None
+        self.is_done = False
+        self.is_cancelled = False
+        self._cancel_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        return self
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    def run(self):
+        try:
+            self.outputs = export_file(self.filename, self.fmt, progress=self.set_progress,
+                                       cancel=self._cancel_event)
+        except ExportCancelled:
+            self.is_cancelled = True
+        except Exception as e:  # Reported by the GUI
+            self.error = e
+        finally:
+            self.is_done = True
+
+    def set_progress(self, fraction):
+        self.progress = fraction
+
+
+def export_files(filenames, fmt, workers=None):
+    # Batch export through a process pool: one recording per task, so several cores convert at once.
+    # Yields (filename, outputs or None, error or None) as each one finishes.
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(export_file, filename, fmt): filename for filename in filenames}
+        for future in as_completed(futures):
+            try:
+                yield futures[future], future.result(), None
+            except Exception as e:
+                yield futures[future], None, e
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export walker recordings to CSV, Parquet, Feather or Excel")
+    parser.add_argument('files', nargs='*', help="recordings to export (default: Data/FW_*.h5)")
+    parser.add_argument('--format', choices=EXPORT_FORMATS, default='csv')
+    parser.add_argument('--workers', type=int, default=None, help="processes (default: one per core)")
+    args = parser.parse_args()
+
+    filenames = args.files or sorted(glob.glob(os.path.join('Data', 'FW_*.h5')))
+    if not filenames:
+        parser.error("no recordings found")
+    failures = 0
+    for index, (filename, outputs, error) in enumerate(export_files(filenames, args.format, args.workers), 1):
+        if error is not None:
+            failures += 1
+            print(f"[{index}/{len(filenames)}] {filename}: failed: {error}")
+        else:
+            print(f"[{index}/{len(filenames)}] {filename} -> {', '.join(outputs)}")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    import multiprocessing
+    multiprocessing.freeze_support()  # Worker processes of a frozen (PyInstaller) build
+    raise SystemExit(main())
@@ -0,0 +1,145 @@
+import numpy as np
+
+from sample_buffer import CHANNELS
+
+# One row per completed loading cycle of one pad; the 'cycles' table of a recording
+CYCLE_DTYPE = np.dtype([('pad', 'u1'), ('start', 'f8'), ('duration', 'f4'), ('peak', 'f4'), ('impulse', 'f4')])
+LEFT = [CHANNELS.index('lr'), CHANNELS.index('lf')]
+RIGHT = [CHANNELS.index('rr'), CHANNELS.index('rf')]
+FRONT = [CHANNELS.index('rf'), CHANNELS.index('lf')]
+REAR = [CHANNELS.index('rr'), CHANNELS.index('lr')]
+
+
+def hysteresis(values, on, off, initial):
+    # Per-column loaded state: turns on above `on`, off below `off`, otherwise keeps the last state.
+    # values (N, channels); initial (channels,) bool state before the first row.
+    n = len(values)
+    decided = (values > on) | (values < off)
+    rows = np.where(decided, np.arange(1, n + 1)[:, None], 0)
+    last = np.maximum.accumulate(rows, axis=0)  # Row (1-based) of the last decision, 0 for none yet
+    state = np.vstack((initial[None, :], values > on))
+    return np.take_along_axis(state, last, axis=0)
+
+
+class GaitAnalyzer:
+    # Finds loading cycles of each pad in the calibrated force stream and measures them as the samples
+    # arrive. A pad is loaded from when it rises above on_grams until it drops below off_grams; cycles
+    # shorter than min_duration are ignored as bumps. Each block costs a few vectorized passes, and
+    # cycles still open at the end of a block carry their running peak and impulse into the next.
+    # Load sharing (left vs right, front vs rear) is the share of load over roughly the last
+    # `ratio_seconds`, from exponentially decaying per-pad sums.
+
+    def __init__(self, on_grams=1000.0, off_grams=500.0, min_duration=0.1, ratio_seconds=10.0,
+                 n_channels=len(CHANNELS)):
+        self.on_grams = on_grams
+        self.off_grams = off_grams
+        self.min_duration = min_duration
+        self.ratio_seconds = ratio_seconds
+        self.n_channels = n_channels
+        self.reset()
+
+    def reset(self):
+        n = self.n_channels
+        self.is_loaded = np.zeros(n, dtype=bool)
+        self.cycle_start = np.zeros(n)
+        self.cycle_peak = np.zeros(n)
+        self.cycle_impulse = np.zeros(n)
+        self.cycle_counts = np.zeros(n, dtype=np.int64)
+        self.load_sums = np.zeros(n)
+        self._last_time = None
+        self._last_values = None
+
+    def add_samples(self, timestamps, values):
+        # timestamps (N,), values (N, channels) in grams; returns the completed cycles (CYCLE_DTYPE)
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        values = np.asarray(values, dtype=np.float64)
+        if not len(timestamps):
+            return np.empty(0, dtype=CYCLE_DTYPE)
+        state = hysteresis(values, self.on_grams, self.off_grams, self.is_loaded)
+        previous = np.vstack((self.is_loaded[None, :], state[:-1]))
+
+        # Trapezoid areas between consecutive samples, counted while the pad stays loaded
+        if self._last_time is None:
+            t_prev = np.concatenate(([timestamps[0]], timestamps[:-1]))
+            v_prev = np.vstack((values[:1], values[:-1]))
+        else:
+            t_prev = np.concatenate(([self._last_time], timestamps[:-1]))
+            v_prev = np.vstack((self._last_values[None, :], values[:-1]))
+        dt = timestamps - t_prev
+        areas = dt[:, None] * (values + v_prev) / 2
+        impulse = np.cumsum(np.where(state & previous, areas, 0.0), axis=0)
+
+        self._update_load_sums(dt, values)
+        cycles = []
+        for pad in range(self.n_channels):
+            starts = np.flatnonzero(state[:, pad] & ~previous[:, pad])
+            ends = np.flatnonzero(~state[:, pad] & previous[:, pad])  # First unloaded row
+            if not len(starts) and not len(ends) and not self.is_loaded[pad]:
+                continue
+            column = values[:, pad]
+            if self.is_loaded[pad]:
+                starts = np.concatenate(([-1], starts))  # Cycle carried over from the last block
+            for start, end in zip(starts, np.concatenate((ends, [len(timestamps)]))):
+                first = max(start, 0)
+                peak = column[first:end].max() if end > first else -np.inf
+                area = impulse[end - 1, pad] - (impulse[start, pad] if start >= 0 else 0.0) if end > 0 else 0.0
+                if start < 0:
+                    peak = max(peak, self.cycle_peak[pad])
+                    area += self.cycle_impulse[pad]
+                    t_start = self.cycle_start[pad]
+                else:
+                    t_start = timestamps[start]
+                if end == len(timestamps):
+                    # Still loaded at the end of the block
+                    self.cycle_start[pad], self.cycle_peak[pad], self.cycle_impulse[pad] = t_start, peak, area
+                    continue
+                duration = timestamps[end - 1] if end > 0 else self._last_time
+                duration -= t_start
+                if duration >= self.min_duration:
+                    cycles.append((pad, t_start, duration, peak, area))
+                    self.cycle_counts[pad] += 1
+        self.is_loaded = state[-1].copy()
+        self._last_time = timestamps[-1]
+        self._last_values = values[-1].copy()
+        cycles = np.array(cycles, dtype=CYCLE_DTYPE)
+        cycles.sort(order=('start', 'pad'))
+        return cycles
+
+    def _update_load_sums(self, dt, values):
+        # Exponentially decaying load integral per pad; only the final sums are kept, so a whole block
+        # decays at once: each row's load is weighted by its age at the end of the block
+        age = np.cumsum(dt[::-1])[::-1] - dt
+        weights = np.exp(-age / self.ratio_seconds) * dt
+        decay = np.exp(-dt.sum() / self.ratio_seconds)
+        self.load_sums = self.load_sums * decay + weights @ np.clip(values, 0, None)
+
+    @property
+    def left_share(self):
+        total = self.load_sums[LEFT].sum() + self.load_sums[RIGHT].sum()
+        return self.load_sums[LEFT].sum() / total if total > 0 else np.nan
+
+    @property
+    def front_share(self):
+        total = self.load_sums[FRONT].sum() + self.load_sums[REAR].sum()
+        return self.load_sums[FRONT].sum() / total if total > 0 else np.nan
+
+    def summary(self):
+        # One line for the status area
+        return (f"cycles {self.cycle_counts.sum()} | left {self.left_share:.0%} right {1 - self.left_share:.0%} | "
+                f"front {self.front_share:.0%} rear {1 - self.front_share:.0%}")
+
+
+def cycle_summary(cycles):
+    # Per pad count, mean peak, impulse and duration of a cycles table, as HDF5 attributes
+    attrs = {}
+    for pad, key in enumerate(CHANNELS):
+        rows = cycles[cycles['pad'] == pad]
+        attrs[f'gait_{key}_cycles'] = len(rows)
+        for field in ('peak', 'impulse', 'duration'):
+            attrs[f'gait_{key}_mean_{field}'] = float(rows[field].mean()) if len(rows) else np.nan
+    impulse = {key: float(cycles['impulse'][cycles['pad'] == pad].sum()) for pad, key in enumerate(CHANNELS)}
+    left, right = impulse['lr'] + impulse['lf'], impulse['rr'] + impulse['rf']
+    front, rear = impulse['rf'] + impulse['lf'], impulse['rr'] + impulse['lr']
+    attrs['gait_left_share'] = left / (left + right) if left + right > 0 else np.nan
+    attrs['gait_front_share'] = front / (front + rear) if front + rear > 0 else np.nan
+    return attrs
@@ -0,0 +1,641 @@
+import tkinter as tk
+from tkinter import ttk
+import serial
+import serial.tools.list_ports
+import threading
+import queue
+import time
+import numpy as np
+from PIL import Image, ImageTk
+import os
+import sys
+from tkinter import simpledialog
+from sample_buffer import CHANNELS
+from catalog import add_to_catalog
+from export import EXPORT_FORMATS, ExportJob
+from recording_file import LAYOUT_CHANNELS, StreamingH5Writer
+from calibration import CalibrationModel, StreamWindow, fit_linear_calibration
+from gait import GaitAnalyzer
+from hand_dynamometer import (HandAcquisition, hand_table, make_hand_devices, EVENT_HAND_CONNECTED,
+                              EVENT_HAND_DISCONNECTED, EVENT_HAND_RECONNECTING)
+from simulator import SIMULATED_PORT, SimulatedSerial, WalkerSimulator, simulator_load
+from acquisition import (AcquisitionWorker, AcquisitionSupervisor, EVENT_STARTING, EVENT_READY,
+                         EVENT_DISCONNECTED, EVENT_RECONNECTING, EVENT_RECONNECTED, EVENT_FAILED)
+
+# before rebuilding, remove scikit learn and joblib and whatever else for analysis
+# pandas and matplotlib are imported where they are used, so the window opens without loading them
+
+
+class WalkerMonitorApp:
+    def __init__(self, root):
+        self.column_headers = None
+        self.recording_start = None
+        self.root = root
+        self.root.title("Walker Force Monitor")
+
+        script_dir = getattr(sys, '_MEIPASS', os.path.dirname(os.path.abspath(__file__)))
+        image_path = os.path.join(script_dir, 'app_data', 'splash.png')
+
+        # Load transparent image
+        self.image = Image.open(image_path)  # Change path to your image
+        self.image = self.image.resize((400, 400))
+        self.photo = ImageTk.PhotoImage(self.image)
+
+        # Create a label to display the image
+        self.image_label = ttk.Label(root, image=self.photo)
+        self.image_label.grid(row=0, column=0, columnspan=3, padx=5, pady=5)
+
+        # Create a StringVar to hold the status text
+        self.status_text = tk.StringVar()
+
+        # Create a label to display the status text
+        self.status_label = ttk.Label(root, textvariable=self.status_text)
+        self.status_label.grid(row=1, column=0, columnspan=3, padx=5, pady=5)
+
+        # Initialize status text
+        self.status_text.set("Ready to connect")  # Initial status
+
+        # Acquisition health (rate, gaps, bad lines, backlog) shown under the status text
+        self.health_text = tk.StringVar()
+        self.health_label = ttk.Label(root, textvariable=self.health_text)
+        self.health_label.grid(row=6, column=0, columnspan=3, padx=5, pady=5)
+
+        # Export format for Save Data, and progress of the export running in the background
+        self.export_format_combobox = ttk.Combobox(root, width=10, state="readonly", values=EXPORT_FORMATS)
+        self.export_format_combobox.set('csv')
+        self.export_format_combobox.grid(row=7, column=0, padx=5, pady=5)
+        self.export_progress = ttk.Progressbar(root, length=250, maximum=1.0)
+        self.export_progress.grid(row=7, column=1, columnspan=2, padx=5, pady=5)
+
+        # Create serial port label
+        self.serial_port_label = ttk.Label(root, text="Select Serial Port:")
+        self.serial_port_label.grid(row=2, column=0, padx=5, pady=5)
+
+        # Create serial port combobox
+        self.serial_port_combobox = ttk.Combobox(root, width=20, state="readonly",
+                                                 postcommand=self.refresh_serial_ports)
+        self.serial_port_combobox.grid(row=2, column=1, padx=5, pady=5)
+        self.serial_port_combobox['values'] = self.list_serial_ports()
+
+        # Create connect button
+        self.connect_button = ttk.Button(root, text="Connect", command=self.connect_serial)
+        self.connect_button.grid(row=2, column=2, padx=5, pady=5)
+
+        # Create record data button
+        self.record_data_button = ttk.Button(root, text="Record Data", command=self.start_recording, state="disabled")
+        self.record_data_button.grid(row=3, column=0, padx=5, pady=5)
+
+        # Create stop recording button
+        self.stop_recording_button = ttk.Button(root, text="Stop Recording", command=self.stop_recording,
+                                                state="disabled")
+        self.stop_recording_button.grid(row=3, column=1, padx=5, pady=5)
+
+        # Create save data button
+        self.save_data_button = ttk.Button(root, text="Save Data", command=self.save_data, state="disabled")
+        self.save_data_button.grid(row=3, column=2, padx=5, pady=5)
+
+        # Create tare button
+        self.tare_button = ttk.Button(root, text="Tare", command=self.tare, state="disabled")
+        self.tare_button.grid(row=4, column=0, padx=5, pady=5)
+
+        # Create calibrate button
+        self.calibrate_button = ttk.Button(root, text="Calibrate", command=self.calibrate, state="disabled")
+        self.calibrate_button.grid(row=4, column=1, padx=5, pady=5)
+
+        # Create view data button
+        self.view_data_button = ttk.Button(root, text="View Data", command=self.view_data, state="disabled")
+        self.view_data_button.grid(row=4, column=2, padx=5, pady=5)
+
+        self.close_button = ttk.Button(root, text="Close", command=self.close_window)
+        self.close_button.grid(row=5, column=2, padx=5, pady=5)
+
+        # Create view data button
+        self.live_data_button = ttk.Button(root, text="Live Data", command=self.live_data, state="disabled")
+        self.live_data_button.grid(row=5, column=1, padx=5, pady=5)
+
+        # Create view data button
+        self.bluetooth_button = ttk.Button(root, text="Bluetooth", command=self.connect_bluetooth, state="disabled")
+        self.bluetooth_button.grid(row=5, column=0, padx=5, pady=5)
+
+        # Initialize variables
+        self.serial = None
+        self.baud_rate = 57600  # Binary-mode firmware can run much faster, e.g. 500000
+        self.bluetooth_connected = False
+        self.is_recording = False
+        self.has_recording = False
+        self.is_reading = False
+        self.is_arduino_starting = False
+        self.is_console_enabled = False
+        self.finished_startup = False
+        self.is_tared = False
+        self.is_calibrated = False
+        # Applied lazily to raw counts; calibration points are (grams, mean counts), tare is the 0 g point
+        self.calibration = CalibrationModel.default()
+        self.stream_job = None  # Tare or calibration window currently collecting from the stream
+        self.tare_seconds = 10
+        self.calibration_seconds = 5
+        self.max_std_grams = 20.0  # Windows noisier than this are rejected as unstable
+        self.max_drift_grams = 20.0  # ...as are windows whose mean moves more than this
+        self.unsaved_data = False
+        self.export_job = None  # Export of the last recording running in the background
+        self.serial_lock = threading.Lock()
+        self.acquisition = None
+        self.supervisor = None  # Owns the port: reconnects with backoff, one reader at a time
+        self.connected_port = None  # Port chosen for the running supervisor
+        self.simulator_load = None  # Load schedule of the SIMULATOR port, read when connecting to it
+        self.outage_start = None  # Recording time at which the connection was lost
+        self.has_handshake = False  # Defaults are only applied on the first handshake after Connect
+        # Sample blocks for the GUI; bounded so a slow UI drops display data instead of stalling acquisition
+        self.sample_queue = queue.Queue(maxsize=256)
+        self.samples_dropped = 0
+        self.poll_interval_ms = 50  # Cadence at which the GUI drains the acquisition queues
+        self.max_batches_per_poll = 64
+        self.health_interval = 1.0  # Seconds between health readouts
+        self.last_health_update = 0.0
+        self.sample_consumers = []  # Called on the main loop with each (timestamps, values) block
+        self.live_plot = None
+        # Loading cycles and load sharing, on the acquisition thread so no sample is missed
+        self.gait = GaitAnalyzer()
+        # Hand dynamometers (lhf, lhx, lhy, rhf, rhx, rhy) on their own BLE event loop thread
+        self.hand = None
+        self.hand_addresses = []  # Left then right BLE address, or SIMULATOR; asked for when empty
+        self.live_window_seconds = 10.0
+        self.live_fps = 20
+        self.writer = None
+        self.recording_file = None
+        self.flush_interval = 1.0  # Seconds between appends to the streamed HDF5 file
+        # LAYOUT_COMPACT with an int32 or float32 dtype and 'lzf'/'gzip' makes much smaller files
+        self.file_format = {'layout': LAYOUT_CHANNELS, 'dtype': np.float64, 'compression': None}
+
+        self.disable_buttons()
+        self.root.after(self.poll_interval_ms, self.poll_acquisition)
+
+    def update_status(self, new_status):  # Update the status text
+        self.status_text.set(new_status)
+
+    def list_serial_ports(self):
+        ports = [port.device for port in serial.tools.list_ports.comports()]
+        if os.environ.get('FORCEWALKER_SIMULATOR'):
+            ports.append(SIMULATED_PORT)  # Simulated walker for testing without hardware
+        return ports
+
+    def refresh_serial_ports(self):
+        # The list is re-read each time it opens, e.g. after the walker was plugged into another port
+        self.serial_port_combobox['values'] = self.list_serial_ports()
+
+    def disable_buttons(self):
+        self.record_data_button.config(state="disabled")
+        self.stop_recording_button.config(state="disabled")
+        self.save_data_button.config(state="disabled")
+        self.tare_button.config(state="disabled")
+        self.calibrate_button.config(state="disabled")
+        self.view_data_button.config(state="disabled")
+        self.live_data_button.config(state="disabled")
+        self.bluetooth_button.config(state="disabled")
+
+    def enable_buttons(self):
+        self.record_data_button.config(state="normal")
+        self.stop_recording_button.config(state="disabled")
+        self.save_data_button.config(state="disabled")
+        self.tare_button.config(state="normal")
+        self.calibrate_button.config(state="disabled")
+        self.view_data_button.config(state="disabled")
+        self.live_data_button.config(state="normal")
+        self.connect_button.config(state="disabled")
+        self.serial_port_combobox.config(state="disabled")
+        self.bluetooth_button.config(state="normal")
+
+    def open_port(self, port):
+        if port == SIMULATED_PORT:
+            return SimulatedSerial(WalkerSimulator(load=self.simulator_load))
+        return serial.Serial(port, self.baud_rate, timeout=1)
+
+    def connect_serial(self):
+        port = self.serial_port_combobox.get()
+        if not port:
+            self.update_status("Select a serial port first")
+            return
+        if port == SIMULATED_PORT:
+            try:
+                self.simulator_load = simulator_load()
+            except ValueError as e:
+                self.update_status(str(e))
+                return
+        if self.supervisor is not None and self.supervisor.is_running:
+            # Exactly one reader per app: connecting to another port replaces the current one
+            if port == self.connected_port:
+                self.update_status(f"Already using {port}; select another port to switch")
+                return
+            if self.is_recording:
+                self.update_status("Stop the recording before switching ports")
+                return
+            self.disconnect_serial()
+        self.update_status(f"Connecting to {port}..")
+        try:
+            self.serial = self.open_port(port)
+            self.is_reading = True
+            self.has_handshake = False
+            self.gait = GaitAnalyzer()
+            self.acquisition = AcquisitionWorker(self.serial, self.handle_samples, lock=self.serial_lock,
+                                                 is_console_enabled=self.is_console_enabled)
+            self.supervisor = AcquisitionSupervisor(self.acquisition, port, self.open_port).start(self.serial)
+            self.connected_port = port
+            self.update_status(f"Connected to {port}, waiting for Arduino")
+        except serial.SerialException:
+            self.update_status(f"Failed to connect to {port}.")
+
+    def disconnect_serial(self):
+        # Stops the supervisor and its worker, e.g. one still retrying a port that is gone
+        self.cancel_stream_job()
+        self.supervisor.stop()
+        self.supervisor = None
+        self.acquisition = None
+        self.serial = None
+        self.connected_port = None
+        self.finished_startup = False
+        self.is_arduino_starting = False
+        self.disable_buttons()
+        self.update_status("Disconnected")
+
+    def auto_tare(self):
+        self.calibration = self.calibration.updated(offsets=np.zeros(len(CHANNELS)), points=())
+        self.is_tared = True
+
+    def auto_cal(self):
+        self.calibration = CalibrationModel.default()
+        self.is_calibrated = True
+
+    def handle_samples(self, timestamps, values):
+        # Runs on the acquisition thread, so no Tk calls in here
+        cycles = self.gait.add_samples(timestamps, self.calibration.apply(values))
+        if self.is_recording:
+            # Raw counts only; calibration is stored with the recording and applied when it is read
+            self.writer.extend(timestamps - self.recording_start, values)
+            cycles['start'] -= self.recording_start
+            self.writer.stream().add_cycles(cycles[cycles['start'] >= 0])
+        self.acquisition.metrics.record_queue_depth(self.sample_queue.qsize())
+        try:
+            # Consumers get raw counts; tare and calibration are computed from them
+            self.sample_queue.put_nowait((timestamps, values))
+        except queue.Full:
+            self.samples_dropped += len(timestamps)
+
+    def poll_acquisition(self):
+        # Runs on the Tk main loop at a fixed cadence
+        if self.acquisition is not None:
+            self.drain_events()
+            self.drain_samples()
+            now = time.monotonic()
+            if now - self.last_health_update >= self.health_interval:
+                self.last_health_update = now
+                self.update_health()
+        if self.stream_job is not None:
+            self.check_stream_job()
+        if self.export_job is not None:
+            self.check_export_job()
+        if self.hand is not None:
+            self.drain_hand_events()
+        self.root.after(self.poll_interval_ms, self.poll_acquisition)
+
+    def update_health(self):
+        summary = self.acquisition.metrics.summary()
+        if self.samples_dropped:
+            summary += f" | display dropped {self.samples_dropped}"
+        if self.finished_startup:
+            summary += "\n" + self.gait.summary()
+        if self.hand is not None:
+            summary += "\n" + self.hand.summary()
+        self.health_text.set(summary)
+
+    def drain_events(self):
+        while True:
+            try:
+                kind, payload = self.acquisition.events.get_nowait()
+            except queue.Empty:
+                return
+            if kind == EVENT_STARTING:
+                self.is_arduino_starting = True
+                self.finished_startup = False
+                if self.is_recording:
+                    self.update_status("Arduino restarting, recording continues")
+                else:
+                    self.update_status("Starting Arduino")
+                    self.disable_buttons()
+            elif kind == EVENT_READY:
+                self.finished_startup = True
+                self.is_arduino_starting = False
+                if not self.has_handshake:
+                    # A reconnect keeps the tare and calibration the user already has
+                    self.has_handshake = True
+                    self.auto_cal()
+                    self.auto_tare()
+                if self.is_recording:
+                    self.update_status("Recording")
+                else:
+                    self.update_status("Ready!")
+                    # Enable buttons
+                    self.enable_buttons()
+                    if self.stream_job is not None:
+                        # Re-handshake during Zeroing or Calibrating: Record stays off until the job is
+                        # done, and the button that started the job can still cancel it
+                        self.record_data_button.config(state="disabled")
+                        if self.stream_job.label == "Calibrating":
+                            self.calibrate_button.config(state="normal")
+            elif kind == EVENT_DISCONNECTED:
+                reason, lost_at = payload
+                if self.is_recording and self.outage_start is None:
+                    self.outage_start = lost_at - self.recording_start
+                if not self.is_recording:
+                    # Retrying goes on, but another port can be picked and connected instead
+                    self.serial_port_combobox.config(state="readonly")
+                    self.connect_button.config(state="normal")
+                self.update_status(f"Serial connection lost: {reason}")
+            elif kind == EVENT_RECONNECTING:
+                attempt, delay, reason = payload
+                self.update_status(f"Reconnecting in {delay:.1f} s (attempt {attempt}): {reason}")
+            elif kind == EVENT_RECONNECTED:
+                self.serial = self.supervisor.port
+                if self.is_recording and self.outage_start is not None:
+                    # The recording resumes; the outage is saved as a gap
+                    self.writer.mark_gap(self.outage_start, payload - self.recording_start)
+                self.outage_start = None
+                self.update_status(f"Reconnected on {self.supervisor.device}, waiting for Arduino")
+            elif kind == EVENT_FAILED:
+                # The reader has stopped for good: save what was recorded and let the user connect again
+                reason, lost_at = payload
+                if self.is_recording:
+                    if self.outage_start is None:
+                        self.outage_start = lost_at - self.recording_start
+                    self.stop_recording()
+                self.cancel_stream_job()
+                self.finished_startup = False
+                for button in (self.record_data_button, self.tare_button, self.calibrate_button,
+                               self.live_data_button, self.bluetooth_button):
+                    button.config(state="disabled")
+                self.serial_port_combobox.config(state="readonly")
+                self.connect_button.config(state="normal")
+                self.update_status(f"Reading stopped: {reason}. Click Connect to start again.")
+
+    def drain_samples(self):
+        # Bounded per tick so a burst of data cannot hold up the main loop
+        for _ in range(self.max_batches_per_poll):
+            try:
+                timestamps, values = self.sample_queue.get_nowait()
+            except queue.Empty:
+                return
+            for consumer in self.sample_consumers:
+                consumer(timestamps, values)
+
+    def reset_data(self):
+        # Samples for rr, rf, lr, and lf, and the hand dynamometers, are streamed to a new file for each
+        # recording
+        self.recording_file = None
+
+    def connect_bluetooth(self):
+        # Toggles the hand dynamometers; they can be connected before or during a recording
+        if self.hand is not None:
+            self.hand.stop()
+            self.hand = None
+            self.bluetooth_connected = False
+            self.update_status("Hand dynamometers disconnected")
+            return
+        if not self.hand_addresses:
+            answer = simpledialog.askstring("Bluetooth", "Hand dynamometer addresses (left, right), or SIMULATOR:")
+            if not answer:
+                return
+            self.hand_addresses = answer.split(',')
+        try:
+            devices = make_hand_devices(self.hand_addresses)
+        except (ImportError, ValueError) as e:
+            self.hand_addresses = []
+            self.update_status(str(e))
+            return
+        # Same clock as the serial samples, so both line up in the recording
+        self.hand = HandAcquisition(devices, self.handle_hand_samples, clock=self.acquisition.clock).start()
+        self.bluetooth_connected = True
+        self.update_status("Connecting hand dynamometers...")
+
+    def handle_hand_samples(self, side, rows):
+        # Runs on the BLE event loop thread, so no Tk calls in here
+        if self.is_recording:
+            rows['time'] -= self.recording_start
+            self.writer.add_rows(hand_table(side), rows[rows['time'] >= 0])
+
+    def drain_hand_events(self):
+        while True:
+            try:
+                kind, payload = self.hand.events.get_nowait()
+            except queue.Empty:
+                return
+            if kind == EVENT_HAND_CONNECTED:
+                side, address = payload
+                self.update_status(f"{side.capitalize()} hand dynamometer connected ({address})")
+            elif kind == EVENT_HAND_DISCONNECTED:
+                side, reason, _ = payload
+                self.update_status(f"{side.capitalize()} hand dynamometer lost: {reason}")
+            elif kind == EVENT_HAND_RECONNECTING:
+                side, attempt, delay, reason = payload
+                self.update_status(f"{side.capitalize()} hand: retrying in {delay:.1f} s (attempt {attempt}): {reason}")
+
+    def start_recording(self):
+        self.reset_data()
+        # Create the 'Data' folder if it does not exist
+        if not os.path.exists('Data'):
+            os.makedirs('Data')
+        self.recording_file = f"Data/FW_{time.strftime('%Y-%m-%d_%H-%M-%S')}.h5"
+        attrs = self.calibration.to_attrs()
+        attrs['raw_counts'] = True
+        self.writer = StreamingH5Writer(self.recording_file, flush_interval=self.flush_interval, attrs=attrs,
+                                        **self.file_format).open()
+        # Health metrics are saved per recording
+        self.acquisition.metrics.reset()
+        self.samples_dropped = 0
+        # Capture the starting timestamp
+        self.recording_start = self.acquisition.clock()
+        self.is_recording = True
+        self.record_data_button.config(state="disabled")
+        self.stop_recording_button.config(state="normal")
+        self.calibrate_button.config(state="disabled")
+        self.tare_button.config(state="disabled")
+        self.save_data_button.config(state="disabled")
+        self.view_data_button.config(state="disabled")
+        self.update_status("Recording")
+
+    def stop_recording(self):
+        self.is_recording = False
+        self.has_recording = True
+        if self.outage_start is not None:
+            # Stopped while disconnected: the outage runs to the end of the recording
+            self.writer.mark_gap(self.outage_start, self.acquisition.clock() - self.recording_start)
+            self.outage_start = None
+        health = self.acquisition.health()
+        health['acq_display_samples_dropped'] = self.samples_dropped
+        if self.hand is not None:
+            health.update(self.hand.health())
+        self.writer.close(attrs=health)
+        print(f"H5 Data saved to {self.recording_file}")
+        add_to_catalog(self.recording_file)
+        if self.writer.error is not None:
+            print("Recording may be incomplete:", self.writer.error)
+        # The HDF5 file is complete on disk; only the export is still outstanding
+        self.unsaved_data = True
+        self.stop_recording_button.config(state="disabled")
+        self.record_data_button.config(state="normal")
+        self.save_data_button.config(state="normal")
+        self.calibrate_button.config(state="normal")
+        self.tare_button.config(state="normal")
+        self.save_data_button.config(state="normal")
+        self.view_data_button.config(state="normal")
+        self.update_status(f"Ready ({self.writer.n_samples} samples saved)")
+
+    def close_window(self):
+        self.update_status("Closing down...")
+        if self.is_recording:
+            self.stop_recording()
+        if self.supervisor is not None:
+            self.supervisor.stop()
+        if self.hand is not None:
+            self.hand.stop()
+        if self.live_plot is not None:
+            self.live_plot.stop()
+        if self.export_job is None and self.unsaved_data:
+            if tk.messagebox.askyesno("Unsaved Data", "The recording has not been exported. Do you want to export before closing?"):
+                self.save_data()
+        if self.export_job is not None:
+            # Let a running export finish rather than leave a partial file behind
+            self.export_job.thread.join()
+
+        self.root.destroy()
+
+    def save_data(self):
+        # The HDF5 file was streamed during the recording; this exports it in the background.
+        # Clicking again while it runs cancels the export.
+        if self.export_job is not None:
+            self.export_job.cancel()
+            return
+        if self.has_recording and self.recording_file:
+            fmt = self.export_format_combobox.get()
+            self.export_job = ExportJob(self.recording_file, fmt).start()
+            self.export_progress['value'] = 0.0
+            self.update_status(f"Exporting {fmt}... 0%")
+        else:
+            self.update_status("No Recording found!")
+
+    def check_export_job(self):
+        job = self.export_job
+        self.export_progress['value'] = job.progress
+        if not job.is_done:
+            self.update_status(f"Exporting {job.fmt}... {job.progress:.0%} (click Save Data again to cancel)")
+            return
+        self.export_job = None
+        if job.is_cancelled:
+            self.update_status("Export cancelled")
+        elif job.error is not None:
+            self.update_status(f"Export failed: {job.error}")
+        else:
+            for output in job.outputs:
+                print(f"Data exported to {output}")
+            self.update_status("Data Saved!")
+            self.unsaved_data = False
+
+    def view_data(self):
+        if self.has_recording and self.recording_file:
+            import matplotlib
+            matplotlib.use('TkAgg')  # Specify the backend before importing pyplot
+            from recording_viewer import show_recording
+            # Loads only what is on screen, so long sessions open and zoom quickly
+            show_recording(self.recording_file)
+        else:
+            self.update_status("No Recording found!")
+
+    def live_data(self):
+        # Toggle the embedded live view next to the controls
+        if self.live_plot is None:
+            from live_plot import LivePlot
+            self.live_plot = LivePlot(self.root, window_seconds=self.live_window_seconds, fps=self.live_fps)
+            self.sample_consumers.append(
+                lambda timestamps, values: self.live_plot.add_samples(timestamps, self.calibration.apply(values)))
+        if self.live_plot.is_running:
+            self.live_plot.stop()
+            self.live_plot.frame.grid_remove()
+            self.live_data_button.config(text="Live Data")
+        else:
+            self.live_plot.frame.grid(row=0, column=3, rowspan=6, padx=5, pady=5, sticky="nsew")
+            self.live_plot.start()
+            self.live_data_button.config(text="Hide Live Data")
+
+    def start_stream_job(self, duration, label, on_done):
+        # Collect a window from the live sample stream; the GUI and acquisition keep running meanwhile
+        gains = np.abs(self.calibration.gains)
+        job = StreamWindow(duration, max_std=self.max_std_grams * gains, max_drift=self.max_drift_grams * gains)
+        job.label = label
+        job.on_done = on_done
+        self.stream_job = job
+        self.sample_consumers.append(job.add_samples)
+        self.record_data_button.config(state="disabled")
+        self.update_status(f"{label}... 0%")
+
+    def cancel_stream_job(self):
+        if self.stream_job is not None:
+            self.stream_job.cancel()
+
+    def check_stream_job(self):
+        job = self.stream_job
+        if not job.is_done:
+            self.update_status(f"{job.label}... {job.progress:.0%} (click again to cancel)")
+            return
+        self.stream_job = None
+        self.sample_consumers.remove(job.add_samples)
+        if self.finished_startup:
+            self.record_data_button.config(state="normal")
+        if job.is_cancelled:
+            self.update_status(f"{job.label} cancelled")
+            return
+        reason = job.instability()
+        if reason:
+            self.update_status(f"{job.label} rejected: {reason}. Keep the walker still and retry.")
+            return
+        job.on_done(job)
+        # Cycles and load sharing start over in the new units; a new analyzer rather than reset(), since
+        # the acquisition thread may be in the middle of a block
+        self.gait = GaitAnalyzer()
+
+    def tare(self):
+        if self.stream_job is not None:
+            self.cancel_stream_job()
+            return
+        self.start_stream_job(self.tare_seconds, "Zeroing", self.finish_tare)
+
+    def finish_tare(self, job):
+        # A new zero invalidates points measured against the old one
+        self.calibration = self.calibration.updated(offsets=job.mean, points=[(0.0, job.mean)])
+        print("Tare values:", self.calibration.offsets)
+        self.update_status("Tared!")
+        self.is_tared = True
+        self.calibrate_button.config(state="normal")
+
+    def calibrate(self):
+        if self.stream_job is not None:
+            self.cancel_stream_job()
+            return
+        calibration_weight = simpledialog.askfloat("Calibration", "Enter calibration weight (grams):")
+        if not calibration_weight:
+            return
+        self.start_stream_job(self.calibration_seconds, "Calibrating",
+                              lambda job: self.finish_calibration(calibration_weight, job))
+
+    def finish_calibration(self, calibration_weight, job):
+        # Each calibration adds a point; the per-channel line is refit through all of them
+        points = self.calibration.points + ((calibration_weight, job.mean),)
+        weights = [weight for weight, _ in points]
+        means = [mean for _, mean in points]
+        gains, offsets = fit_linear_calibration(weights, means, self.calibration.offsets)
+        self.calibration = self.calibration.updated(gains=gains, offsets=offsets, points=points)
+        self.is_tared = True
+        self.is_calibrated = True
+        print("Calibration values:", self.calibration.gains)
+        self.update_status(f"Calibrated! ({len(points)} points)")
+
+    def run(self):
+        self.root.mainloop()
+
@@ -0,0 +1,420 @@
+import asyncio
+import importlib
+import queue
+import struct
+import threading
+import time
+
+import numpy as np
+
+SIMULATED_HAND = "SIMULATOR"  # Address that selects FakeHandDevice instead of a BLE dynamometer
+HAND_SIDES = ('left', 'right')
+HAND_FIELDS = ('force', 'x', 'y')
+HAND_CHANNELS = ('lhf', 'lhx', 'lhy', 'rhf', 'rhx', 'rhy')
+HAND_CHANNEL_NAMES = ('Left-Hand-Force', 'Left-Hand-X', 'Left-Hand-Y',
+                      'Right-Hand-Force', 'Right-Hand-X', 'Right-Hand-Y')
+HAND_SHEETS = ('LHF', 'LHX', 'LHY', 'RHF', 'RHX', 'RHY')
+# One row per notification of one dynamometer; the hand_left and hand_right tables of a recording
+HAND_DTYPE = np.dtype([('time', 'f8'), ('force', 'f4'), ('x', 'f4'), ('y', 'f4')])
+
+# Vernier Go Direct BLE protocol, as used by the gdx/godirect library. Commands are written to the
+# command characteristic and answered on the response one; both are packets of a 0x58 (command) or
+# response type byte, the packet length, a rolling counter, a checksum and the command id.
+GDX_COMMAND_UUID = 'f4bf14a6-c7d5-4b6d-8aa8-df1a7c83adcb'
+GDX_RESPONSE_UUID = 'b41e6675-a329-40e0-aa01-44d2f444babe'
+GDX_WRITE_SIZE = 20  # Bytes per write; longer commands are split
+GDX_START_MEASUREMENTS = 0x18
+GDX_STOP_MEASUREMENTS = 0x19
+GDX_INIT = 0x1A
+GDX_SET_MEASUREMENT_PERIOD = 0x1B
+GDX_GET_SENSOR_INFO = 0x50
+GDX_GET_SENSOR_AVAILABLE_MASK = 0x51
+GDX_INIT_PAYLOAD = bytes([0xa5, 0x4a, 0x06, 0x49, 0x07, 0x48, 0x08, 0x47, 0x09, 0x46,
+                          0x0a, 0x45, 0x0b, 0x44, 0x0c, 0x43, 0x0d, 0x42, 0x0e, 0x41])
+GDX_MEASUREMENT = 0x20  # Type byte of measurement packets, which arrive unasked once started
+GDX_NORMAL_REAL32 = 0x06  # uint16 sensor mask, sample count, then float32 per sample and sensor
+GDX_WIDE_REAL32 = 0x07  # Same with a uint32 sensor mask
+GDX_DROPPED = 0x0d  # The device had to drop measurements
+# Sensor info: number, spare, id, measurement type, sampling mode, description, units, uncertainty,
+# min and max value, min, max and typical period (us), period granularity, mutual exclusion mask
+GDX_SENSOR_INFO = struct.Struct('<bBIBB60s32sdddIQIII')
+
+# Events posted for the GUI or headless loop, drained from HandAcquisition.events
+EVENT_HAND_CONNECTED = 'hand_connected'  # payload is (side, address)
+EVENT_HAND_DISCONNECTED = 'hand_disconnected'  # payload is (side, reason, clock() time of the loss)
+EVENT_HAND_RECONNECTING = 'hand_reconnecting'  # payload is (side, attempt, delay, reason)
+
+
+def hand_table(side):
+    return f'hand_{side}'
+
+
+def _require_bleak():
+    # BLE is optional: bleak is only needed when real dynamometers are connected
+    try:
+        return importlib.import_module('bleak')
+    except ImportError as e:
+        raise ImportError("Bluetooth hand dynamometers need bleak (pip install bleak)") from e
+
+
+class GdxHandDevice:
+    # A Vernier GDX-HD hand dynamometer reached through bleak. Like every hand device it has three
+    # coroutines run on the HandAcquisition event loop: connect(on_disconnect) opens the link and
+    # initializes the device (on_disconnect is called when the link drops), start_notify(handler) starts
+    # measurements every `period` seconds and calls handler(samples, lost) with the (N, 3) force, x and y
+    # samples of each measurement packet, oldest first, and disconnect() stops and closes the link.
+    # The force, x and y sensors are found by their descriptions; a missing x or y sensor gives NaN.
+
+    def __init__(self, address, period=0.02, timeout=5.0):
+        self.bleak = _require_bleak()
+        self.address = address
+        self.period = period
+        self.timeout = timeout  # Seconds to wait for the answer to a command
+        self.client = None
+        self.sensors = None  # Sensor numbers of force, x and y (None for missing ones)
+        self.bad_packets = 0
+        self._handler = None
+        self._responses = None
+        self._received = bytearray()
+        self._counter = 0xFF
+
+    async def connect(self, on_disconnect):
+        self._responses = asyncio.Queue()
+        self._received = bytearray()
+        self._counter = 0xFF
+        self.client = self.bleak.BleakClient(self.address, disconnected_callback=lambda _: on_disconnect())
+        await self.client.connect()
+        await self.client.start_notify(GDX_RESPONSE_UUID, self._on_notification)
+        await self._command(GDX_INIT, GDX_INIT_PAYLOAD)
+
+    async def start_notify(self, handler):
+        if self.sensors is None:
+            self.sensors = await self._find_sensors()
+        mask = sum(1 << number for number in self.sensors if number is not None)
+        await self._command(GDX_SET_MEASUREMENT_PERIOD,
+                            b'\xff\x00' + struct.pack('<I', round(self.period * 1e6)) + bytes(4))
+        self._handler = handler
+        await self._command(GDX_START_MEASUREMENTS, b'\xff\x01' + struct.pack('<I', mask) + bytes(8))
+
+    async def disconnect(self):
+        if self.client is None:
+            return
+        try:
+            if self.client.is_connected:
+                await self._command(GDX_STOP_MEASUREMENTS, b'\xff\x00\xff\xff\xff\xff', timeout=1.0)
+        finally:
+            client, self.client = self.client, None
+            self._handler = None
+            await client.disconnect()
+
+    async def _find_sensors(self):
+        response = await self._command(GDX_GET_SENSOR_AVAILABLE_MASK)
+        available = struct.unpack_from('<I', response, 6)[0]
+        descriptions = {}
+        for number in range(32):
+            if available >> number & 1:
+                info = GDX_SENSOR_INFO.unpack_from(await self._command(GDX_GET_SENSOR_INFO, bytes([number])), 6)
+                descriptions[number] = info[5].split(b'\0')[0].decode('utf-8', 'replace').lower()
+        sensors = [next((number for number, description in descriptions.items() if description.startswith(field)),
+                        None) for field in HAND_FIELDS]
+        if sensors[0] is None:
+            raise ValueError(f"{self.address} has no force sensor: {sorted(descriptions.values())}")
+        return sensors
+
+    async def _command(self, command, payload=b'', timeout=None):
+        # Send one command and wait for its answer; measurements arriving meanwhile are delivered
+        while not self._responses.empty():
+            self._responses.get_nowait()  # Late answer to a command that timed out
+        self._counter = (self._counter - 1) & 0xFF
+        packet = bytearray((0x58, 5 + len(payload), self._counter, 0, command)) + payload
+        packet[3] = sum(packet) & 0xFF
+        for start in range(0, len(packet), GDX_WRITE_SIZE):
+            await self.client.write_gatt_char(GDX_COMMAND_UUID, packet[start:start + GDX_WRITE_SIZE], response=False)
+        return await asyncio.wait_for(self._responses.get(), timeout or self.timeout)
+
+    def _on_notification(self, _, data):
+        # Packets can be split over several notifications; the second byte is the packet length
+        self._received += data
+        while len(self._received) >= 2 and len(self._received) >= self._received[1]:
+            length = self._received[1]
+            if length < 5:
+                self.bad_packets += 1
+                self._received.clear()
+                return
+            packet, self._received = bytes(self._received[:length]), self._received[length:]
+            if packet[0] == GDX_MEASUREMENT:
+                self._on_measurement(packet)
+            else:
+                self._responses.put_nowait(packet)
+
+    def _on_measurement(self, packet):
+        if self._handler is None:
+            return  # Still streaming from before a reconnect; measurements restart once set up
+        kind = packet[4]
+        if kind == GDX_DROPPED:
+            self._handler(np.empty((0, len(HAND_FIELDS))), 1)  # Counted as one, the report has no count
+            return
+        try:
+            if kind == GDX_NORMAL_REAL32:
+                mask, count, offset = struct.unpack_from('<H', packet, 5)[0], packet[7], 9
+            elif kind == GDX_WIDE_REAL32:
+                mask, count, offset = struct.unpack_from('<I', packet, 5)[0], packet[9], 11
+            else:
+                return  # Start time and period reports
+            numbers = [number for number in range(32) if mask >> number & 1]
+            values = np.frombuffer(packet, dtype='<f4', count=count * len(numbers), offset=offset)
+        except (struct.error, IndexError, ValueError):
+            self.bad_packets += 1
+            return
+        values = values.reshape(count, len(numbers))
+        samples = np.full((count, len(HAND_FIELDS)), np.nan)
+        for column, number in enumerate(self.sensors):
+            if number in numbers:
+                samples[:, column] = values[:, numbers.index(number)]
+        self._handler(samples, 0)
+
+
+class FakeHandDevice:
+    # Behaves like a GdxHandDevice on the event loop, for testing without hardware: delivers one sample
+    # every 1 / `rate` seconds with a grip that rises and falls at `cadence` Hz, as a walker user pushes
+    # up with each step. Lost samples (drop_rate) and a dropped link after `disconnect_after` seconds
+    # can be injected to exercise the error handling.
+
+    def __init__(self, side, rate=50.0, cadence=0.9, peak_newtons=150.0, noise=0.5, drop_rate=0.0,
+                 disconnect_after=None, seed=None):
+        self.address = f"{SIMULATED_HAND}-{side}"
+        self.rate = rate
+        self.period = 1.0 / rate
+        self.cadence = cadence
+        self.peak_newtons = peak_newtons
+        self.noise = noise
+        self.drop_rate = drop_rate
+        self.disconnect_after = disconnect_after
+        self.phase = 0.0 if side == 'left' else np.pi  # Hands push alternately
+        self.rng = np.random.default_rng(seed)
+        self.notifications_sent = 0
+        self.bad_packets = 0
+        self._on_disconnect = None
+        self._task = None
+
+    async def connect(self, on_disconnect):
+        await asyncio.sleep(0.01)  # Connection round trip
+        self._on_disconnect = on_disconnect
+
+    async def start_notify(self, handler):
+        self._task = asyncio.get_running_loop().create_task(self._notify(handler))
+
+    async def disconnect(self):
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+
+    async def _notify(self, handler):
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        sequence = 0
+        dropped = 0
+        while True:
+            sequence += 1
+            await asyncio.sleep(max(0.0, start + sequence / self.rate - loop.time()))
+            t = sequence / self.rate
+            if self.disconnect_after is not None and t >= self.disconnect_after:
+                self.disconnect_after = None  # Once; the reconnected device keeps going
+                self._task = None
+                self._on_disconnect()
+                return
+            if self.drop_rate and self.rng.random() < self.drop_rate:
+                dropped += 1
+                continue
+            grip = self.peak_newtons * max(np.sin(2 * np.pi * self.cadence * t + self.phase), 0.0)
+            sample = np.array([[grip, 0.2 * grip, -0.1 * grip]]) + self.rng.normal(0, self.noise, size=(1, 3))
+            handler(sample, dropped)
+            dropped = 0
+            self.notifications_sent += 1
+
+
+def make_hand_devices(addresses):
+    # {side: device} from left and right addresses in that order; SIMULATOR gives fake dynamometers
+    # for both hands
+    addresses = [address.strip() for address in addresses if address and address.strip()]
+    if addresses == [SIMULATED_HAND]:
+        return {side: FakeHandDevice(side) for side in HAND_SIDES}
+    if not 1 <= len(addresses) <= len(HAND_SIDES):
+        raise ValueError("Give the left and optionally the right hand dynamometer address")
+    return {side: FakeHandDevice(side) if address == SIMULATED_HAND else GdxHandDevice(address)
+            for side, address in zip(HAND_SIDES, addresses)}
+
+
+class HandAcquisition:
+    # Hand dynamometers over BLE, on a dedicated asyncio event loop thread next to the serial reader.
+    # Samples are stamped with the shared monotonic `clock` as their packet arrives, earlier samples of
+    # the same packet one device period apart. The rows are handed to on_samples(side, rows) every
+    # batch_interval seconds from the loop thread, so the serial reader only competes with a short burst
+    # a few times a second and no lock is shared with it. Each device reconnects with exponential
+    # backoff, like the serial supervisor, and connection changes are posted to `events`.
+
+    def __init__(self, devices, on_samples, clock=time.monotonic, batch_interval=0.1, initial_backoff=0.5,
+                 max_backoff=10.0, event_queue_size=64):
+        self.devices = dict(devices)
+        self.on_samples = on_samples
+        self.clock = clock
+        self.batch_interval = batch_interval
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.events = queue.Queue(maxsize=event_queue_size)
+        self.events_dropped = 0
+        self.received = {side: 0 for side in self.devices}
+        self.lost = {side: 0 for side in self.devices}
+        self.latest = {}  # side -> (time, force, x, y) of the last sample
+        self.loop = None
+        self.thread = None
+        self._pending = {side: [] for side in self.devices}
+        self._stop = None
+
+    @property
+    def is_running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self):
+        self.loop = asyncio.new_event_loop()
+        self._stop = asyncio.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self, timeout=5.0):
+        if self.loop is not None and self.is_running:
+            self.loop.call_soon_threadsafe(self._stop.set)
+            self.thread.join(timeout)
+
+    def post_event(self, kind, payload=None):
+        try:
+            self.events.put_nowait((kind, payload))
+        except queue.Full:
+            self.events_dropped += 1
+
+    def backoff(self, attempt):
+        return min(self.max_backoff, self.initial_backoff * 2 ** (attempt - 1))
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_until_complete(self._main())
+        finally:
+            self.loop.close()
+
+    async def _main(self):
+        tasks = [asyncio.create_task(self._run_device(side, device)) for side, device in self.devices.items()]
+        tasks.append(asyncio.create_task(self._deliver()))
+        await self._stop.wait()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._flush()
+
+    async def _run_device(self, side, device):
+        attempt = 0
+        while True:
+            disconnected = asyncio.Event()
+            try:
+                await device.connect(lambda event=disconnected: self.loop.call_soon_threadsafe(event.set))
+                await device.start_notify(lambda samples, lost, side=side: self._on_samples(side, samples, lost))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:  # bleak raises its own errors, OSError and timeouts; all mean retry
+                await self._disconnect(device)
+                attempt += 1
+                delay = self.backoff(attempt)
+                self.post_event(EVENT_HAND_RECONNECTING, (side, attempt, delay, str(e)))
+                await asyncio.sleep(delay)
+                continue
+            attempt = 0
+            self.post_event(EVENT_HAND_CONNECTED, (side, device.address))
+            try:
+                await disconnected.wait()
+            finally:
+                await self._disconnect(device)
+            self.post_event(EVENT_HAND_DISCONNECTED, (side, "connection lost", self.clock()))
+            attempt = 1
+            await asyncio.sleep(self.backoff(attempt))
+
+    async def _disconnect(self, device):
+        try:
+            await device.disconnect()
+        except Exception:  # Already gone
+            pass
+
+    def _on_samples(self, side, samples, lost):
+        # On the event loop thread, once per packet: keep it to a timestamp and a copy
+        timestamp = self.clock()
+        rows = np.empty(len(samples), dtype=HAND_DTYPE)
+        rows['time'] = timestamp - self.devices[side].period * np.arange(len(samples) - 1, -1, -1)
+        for column, field in enumerate(HAND_FIELDS):
+            rows[field] = samples[:, column]
+        self.lost[side] += lost
+        self.received[side] += len(rows)
+        if len(rows):
+            self._pending[side].append(rows)
+
+    async def _deliver(self):
+        while True:
+            await asyncio.sleep(self.batch_interval)
+            self._flush()
+
+    def _flush(self):
+        for side, pending in self._pending.items():
+            if pending:
+                self._pending[side] = []
+                rows = np.concatenate(pending)
+                self.latest[side] = tuple(rows[-1])
+                self.on_samples(side, rows)
+
+    def health(self):
+        # HDF5 attributes for the recording file
+        attrs = {'hand_bad_packets': sum(device.bad_packets for device in self.devices.values()),
+                 'hand_events_dropped': self.events_dropped}
+        for side, device in self.devices.items():
+            attrs[f'hand_{side}_address'] = device.address
+            attrs[f'hand_{side}_received'] = self.received[side]
+            attrs[f'hand_{side}_lost'] = self.lost[side]
+        return attrs
+
+    def summary(self):
+        # One line for the status area
+        parts = []
+        for side in self.devices:
+            latest = self.latest.get(side)
+            force = f"{latest[1]:.1f} N" if latest is not None else "-"
+            parts.append(f"{side} {force} (lost {self.lost[side]})")
+        return "hands " + " | ".join(parts)
+
+
+def read_hand_tables(f):
+    # {side: HAND_DTYPE rows} of an open recording file, for the hands it has
+    return {side: f[hand_table(side)][:] for side in HAND_SIDES if hand_table(side) in f}
+
+
+def hand_at(tables, timestamps, max_gap=0.5):
+    # The six hand channels (N, 6) at the walker's sample times, interpolated from each dynamometer's
+    # own samples on the shared clock. NaN before or after a hand's data, across gaps longer than
+    # max_gap seconds (a lost link), and for a hand that was not connected.
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    out = np.full((len(timestamps), len(HAND_CHANNELS)), np.nan)
+    for index, side in enumerate(HAND_SIDES):
+        table = tables.get(side)
+        if table is None:
+            continue
+        # Back-dated samples of multi-sample packets can overlap the packet before; np.interp needs
+        # increasing times, so sort and keep the first row of each time
+        table = table[np.argsort(table['time'], kind='stable')]
+        t, first = np.unique(table['time'], return_index=True)
+        table = table[first]
+        if len(t) < 2:
+            continue
+        right = np.clip(np.searchsorted(t, timestamps), 1, len(t) - 1)
+        missing = (timestamps < t[0]) | (timestamps > t[-1]) | (t[right] - t[right - 1] > max_gap)
+        for column, field in enumerate(HAND_FIELDS):
+            values = np.interp(timestamps, t, table[field].astype(np.float64))
+            values[missing] = np.nan
+            out[:, index * len(HAND_FIELDS) + column] = values
+    return out
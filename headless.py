@@ -0,0 +1,300 @@
+import os
+import queue
+import signal
+import threading
+import time
+
+import numpy as np
+import serial
+import serial.tools.list_ports
+
+from acquisition import (AcquisitionWorker, AcquisitionSupervisor, EVENT_STARTING, EVENT_READY,
+                         EVENT_DISCONNECTED, EVENT_RECONNECTING, EVENT_RECONNECTED, EVENT_FAILED)
+from calibration import CalibrationModel, StreamWindow
+from catalog import add_to_catalog
+from gait import GaitAnalyzer
+from hand_dynamometer import (HandAcquisition, hand_table, make_hand_devices, EVENT_HAND_CONNECTED,
+                              EVENT_HAND_DISCONNECTED, EVENT_HAND_RECONNECTING)
+from recording_file import LAYOUT_CHANNELS, StreamingH5Writer
+from simulator import SIMULATED_PORT, SimulatedSerial, WalkerSimulator, simulator_load
+
+
+def default_recording_file(directory='Data'):
+    return os.path.join(directory, f"FW_{time.strftime('%Y-%m-%d_%H-%M-%S')}.h5")
+
+
+def parse_duration(text):
+    # Seconds, or a number with an s/m/h suffix ("90", "45m", "8h")
+    units = {'s': 1, 'm': 60, 'h': 3600}
+    text = text.strip().lower()
+    if text and text[-1] in units:
+        return float(text[:-1]) * units[text[-1]]
+    return float(text)
+
+
+def find_default_port():
+    # The only connected serial port, so a bench machine with one walker needs no --port
+    ports = [port.device for port in serial.tools.list_ports.comports()]
+    if len(ports) != 1:
+        raise ValueError(f"Specify --port, found {len(ports)} serial ports: {', '.join(ports) or 'none'}")
+    return ports[0]
+
+
+class HeadlessWalker:
+    # One walker of a headless session: its own reader thread (worker and supervisor), calibration
+    # and output stream, and gait analysis of its calibrated samples. `name` is its group in the
+    # recording file, None for a single walker.
+
+    def __init__(self, name, device, calibration):
+        self.name = name
+        self.device = device
+        self.calibration = calibration
+        self.acquisition = None
+        self.supervisor = None
+        self.stream = None
+        self.stream_job = None
+        self.gait = GaitAnalyzer()
+        self.is_ready = False
+        self.outage_start = None
+
+
+class HeadlessRecorder:
+    # Unattended recording without a display, for long sessions on a bench machine. Connects to one or
+    # more walkers, waits for their firmware handshakes, optionally zeroes from the live stream, then
+    # streams raw counts to one HDF5 file for `duration` seconds (None: until Ctrl+C or SIGTERM).
+    # Uses the same worker, supervisor, calibration model and writer as the GUI. Every walker has its
+    # own reader thread and all share one monotonic clock, so their timestamps can be compared.
+    # Hand dynamometers (hand_addresses, left then right) run on their own BLE event loop on the same
+    # clock and are saved at the file root.
+
+    def __init__(self, ports, output=None, duration=None, baud_rate=57600, calibrations=None, tare_seconds=0.0,
+                 flush_interval=1.0, status_interval=10.0, handshake_timeout=30.0, layout=LAYOUT_CHANNELS,
+                 dtype=np.float64, compression=None, hand_addresses=None):
+        if isinstance(ports, str):
+            ports = [ports]
+        if calibrations is None or isinstance(calibrations, CalibrationModel):
+            calibrations = [calibrations] * len(ports)
+        if len(calibrations) != len(ports):
+            raise ValueError(f"{len(calibrations)} calibrations for {len(ports)} walkers")
+        names = [None] if len(ports) == 1 else [f"walker{index + 1}" for index in range(len(ports))]
+        self.walkers = [HeadlessWalker(name, port, calibration or CalibrationModel.default())
+                        for name, port, calibration in zip(names, ports, calibrations)]
+        self.output = output or default_recording_file()
+        self.duration = duration
+        self.baud_rate = baud_rate
+        self.tare_seconds = tare_seconds
+        self.flush_interval = flush_interval
+        self.file_format = {'layout': layout, 'dtype': dtype, 'compression': compression}
+        self.status_interval = status_interval
+        self.handshake_timeout = handshake_timeout
+        self.poll_interval = 0.1  # Seconds between event checks
+        self.max_std_grams = 20.0  # Same stability limits as the GUI's tare
+        self.max_drift_grams = 20.0
+        self.clock = time.monotonic  # Shared by all walkers and the hand dynamometers
+        self.hand_devices = make_hand_devices(hand_addresses) if hand_addresses else None
+        self.simulator_load = simulator_load() if SIMULATED_PORT in ports else None
+        self.hand = None
+        self.writer = None
+        self.is_recording = False
+        self.recording_start = None
+        self._stop_event = threading.Event()
+
+    def open_port(self, port):
+        if port == SIMULATED_PORT:
+            return SimulatedSerial(WalkerSimulator(load=self.simulator_load))
+        return serial.Serial(port, self.baud_rate, timeout=1)
+
+    def log(self, message, walker=None):
+        prefix = f"[{walker.name} {walker.device}] " if walker is not None and walker.name else ""
+        print(f"{time.strftime('%H:%M:%S')} {prefix}{message}", flush=True)
+
+    def request_stop(self, *_):
+        self._stop_event.set()
+
+    def handle_samples(self, walker, timestamps, values):
+        # Runs on the walker's acquisition thread; gait analysis sees every sample, unlike a display
+        job = walker.stream_job
+        if job is not None:
+            job.add_samples(timestamps, values)
+        cycles = walker.gait.add_samples(timestamps, walker.calibration.apply(values))
+        if self.is_recording:
+            walker.stream.extend(timestamps - self.recording_start, values)
+            cycles['start'] -= self.recording_start
+            walker.stream.add_cycles(cycles[cycles['start'] >= 0])
+
+    def handle_hand_samples(self, side, rows):
+        # Runs on the BLE event loop thread
+        if self.is_recording:
+            rows['time'] -= self.recording_start
+            self.writer.add_rows(hand_table(side), rows[rows['time'] >= 0])
+
+    def handle_hand_event(self, kind, payload):
+        if kind == EVENT_HAND_CONNECTED:
+            side, address = payload
+            self.log(f"{side.capitalize()} hand dynamometer connected ({address})")
+        elif kind == EVENT_HAND_DISCONNECTED:
+            side, reason, _ = payload
+            self.log(f"{side.capitalize()} hand dynamometer lost: {reason}")
+        elif kind == EVENT_HAND_RECONNECTING:
+            side, attempt, delay, reason = payload
+            self.log(f"{side.capitalize()} hand: retrying in {delay:.1f} s (attempt {attempt}): {reason}")
+
+    def handle_event(self, walker, kind, payload):
+        if kind == EVENT_STARTING:
+            walker.is_ready = False
+            self.log("Arduino starting" + (", recording continues" if self.is_recording else ""), walker)
+        elif kind == EVENT_READY:
+            walker.is_ready = True
+            self.log(f"Ready {payload}", walker)
+        elif kind == EVENT_DISCONNECTED:
+            reason, lost_at = payload
+            if self.is_recording and walker.outage_start is None:
+                walker.outage_start = lost_at - self.recording_start
+            self.log(f"Serial connection lost: {reason}", walker)
+        elif kind == EVENT_RECONNECTING:
+            attempt, delay, reason = payload
+            self.log(f"Reconnecting in {delay:.1f} s (attempt {attempt}): {reason}", walker)
+        elif kind == EVENT_RECONNECTED:
+            if self.is_recording and walker.outage_start is not None:
+                walker.stream.mark_gap(walker.outage_start, payload - self.recording_start)
+            walker.outage_start = None
+            self.log(f"Reconnected on {walker.supervisor.device}", walker)
+        elif kind == EVENT_FAILED:
+            reason, lost_at = payload
+            if self.is_recording and walker.outage_start is None:
+                walker.outage_start = lost_at - self.recording_start
+            # The walker is no longer read; run() saves what was recorded and exits with an error
+            raise RuntimeError(f"[{walker.device}] Reading stopped: {reason}")
+
+    def drain_events(self):
+        for walker in self.walkers:
+            while True:
+                try:
+                    kind, payload = walker.acquisition.events.get_nowait()
+                except queue.Empty:
+                    break
+                self.handle_event(walker, kind, payload)
+        while self.hand is not None:
+            try:
+                kind, payload = self.hand.events.get_nowait()
+            except queue.Empty:
+                break
+            self.handle_hand_event(kind, payload)
+
+    def log_status(self):
+        elapsed = self.clock() - self.recording_start
+        self.log(f"{elapsed:.0f} s, {self.writer.n_samples} samples")
+        for walker in self.walkers:
+            self.log(walker.acquisition.metrics.summary(), walker)
+            self.log(walker.gait.summary(), walker)
+        if self.hand is not None:
+            self.log(self.hand.summary())
+
+    def wait_for(self, condition, timeout=None):
+        # Handle acquisition events on this thread until condition() holds; False on timeout or stop
+        deadline = None if timeout is None else time.monotonic() + timeout
+        last_status = time.monotonic()
+        while True:
+            self.drain_events()
+            if condition():
+                return True
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            if self.is_recording and time.monotonic() - last_status >= self.status_interval:
+                last_status = time.monotonic()
+                self.log_status()
+            if self._stop_event.wait(self.poll_interval):
+                return False
+
+    def tare(self):
+        # All walkers are zeroed at the same time
+        self.log(f"Zeroing for {self.tare_seconds:g} s, keep the walkers unloaded")
+        for walker in self.walkers:
+            gains = np.abs(walker.calibration.gains)
+            walker.stream_job = StreamWindow(self.tare_seconds, max_std=self.max_std_grams * gains,
+                                             max_drift=self.max_drift_grams * gains)
+        self.wait_for(lambda: all(walker.stream_job.is_done for walker in self.walkers),
+                      self.tare_seconds + self.handshake_timeout)
+        for walker in self.walkers:
+            job, walker.stream_job = walker.stream_job, None
+            reason = job.instability() if job.is_done else "timed out"
+            if reason:
+                raise RuntimeError(f"Zeroing {walker.device} rejected: {reason}")
+            walker.calibration = walker.calibration.updated(offsets=job.mean, points=[(0.0, job.mean)])
+            walker.gait = GaitAnalyzer()  # Cycles so far were measured against the old zero
+            self.log(f"Tare values: {walker.calibration.offsets}", walker)
+
+    def start_recording(self):
+        directory = os.path.dirname(self.output)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        attrs = {'raw_counts': True, 'headless': True, 'clock': 'monotonic'}
+        if len(self.walkers) == 1:
+            attrs.update(self.walkers[0].calibration.to_attrs())
+            attrs['device'] = self.walkers[0].device
+            groups = None
+        else:
+            groups = {walker.name: dict(walker.calibration.to_attrs(), device=walker.device)
+                      for walker in self.walkers}
+        self.writer = StreamingH5Writer(self.output, flush_interval=self.flush_interval, attrs=attrs,
+                                        groups=groups, **self.file_format).open()
+        for walker in self.walkers:
+            walker.stream = self.writer.stream(walker.name)
+            walker.acquisition.metrics.reset()
+        self.recording_start = self.clock()
+        self.is_recording = True
+        self.log(f"Recording {len(self.walkers)} walker(s) to {self.output}"
+                 + (f" for {self.duration:g} s" if self.duration else ""))
+
+    def stop_recording(self):
+        self.is_recording = False
+        group_attrs = {}
+        for walker in self.walkers:
+            if walker.outage_start is not None:
+                walker.stream.mark_gap(walker.outage_start, self.clock() - self.recording_start)
+                walker.outage_start = None
+            group_attrs[walker.name] = walker.acquisition.health()
+        self.writer.close(attrs=self.hand.health() if self.hand is not None else None, group_attrs=group_attrs)
+        self.log(f"H5 Data saved to {self.output} ({self.writer.n_samples} samples)")
+        add_to_catalog(self.output)
+        if self.writer.error is not None:
+            self.log(f"Recording may be incomplete: {self.writer.error}")
+
+    def connect(self, walker):
+        walker.acquisition = AcquisitionWorker(
+            None, lambda timestamps, values: self.handle_samples(walker, timestamps, values), clock=self.clock)
+        # The first open happens on the supervisor thread, which also retries it
+        walker.supervisor = AcquisitionSupervisor(walker.acquisition, walker.device, self.open_port).start()
+
+    def run(self):
+        # Returns a process exit code
+        for name in ('SIGINT', 'SIGTERM'):
+            if hasattr(signal, name):
+                signal.signal(getattr(signal, name), self.request_stop)
+        self.log(f"Connecting to {', '.join(walker.device for walker in self.walkers)}")
+        for walker in self.walkers:
+            self.connect(walker)
+        if self.hand_devices:
+            self.hand = HandAcquisition(self.hand_devices, self.handle_hand_samples, clock=self.clock).start()
+        try:
+            if not self.wait_for(lambda: all(walker.is_ready for walker in self.walkers), self.handshake_timeout):
+                if not self._stop_event.is_set():
+                    missing = [walker.device for walker in self.walkers if not walker.is_ready]
+                    self.log(f"No handshake from the Arduino on {', '.join(missing)}")
+                return 1
+            if self.tare_seconds:
+                self.tare()
+            self.start_recording()
+            end = None if self.duration is None else time.monotonic() + self.duration
+            self.wait_for(lambda: end is not None and time.monotonic() >= end)
+            return 0
+        except RuntimeError as e:
+            self.log(str(e))
+            return 1
+        finally:
+            if self.is_recording:
+                self.stop_recording()
+            for walker in self.walkers:
+                walker.supervisor.stop()
+            if self.hand is not None:
+                self.hand.stop()
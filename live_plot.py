@@ -0,0 +1,178 @@
+import time
+from tkinter import ttk
+
+import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+
+from sample_buffer import CHANNEL_NAMES
+
+
+class SampleWindow:
+    # Most recent samples in a linear buffer of twice the capacity. When the end is reached the
+    # newest `capacity` rows are moved back to the front, so the live part is always one contiguous
+    # slice and reading it never copies.
+
+    def __init__(self, capacity=65536, n_channels=len(CHANNEL_NAMES)):
+        self.capacity = capacity
+        self._timestamps = np.empty(2 * capacity, dtype=np.float64)
+        self._values = np.empty((2 * capacity, n_channels), dtype=np.float64)
+        self._start = 0
+        self._stop = 0
+
+    def __len__(self):
+        return self._stop - self._start
+
+    def add(self, timestamps, values):
+        count = len(timestamps)
+        if count >= self.capacity:
+            timestamps, values, count = timestamps[-self.capacity:], values[-self.capacity:], self.capacity
+        if self._stop + count > 2 * self.capacity:
+            keep = min(len(self), self.capacity - count)
+            self._timestamps[:keep] = self._timestamps[self._stop - keep:self._stop]
+            self._values[:keep] = self._values[self._stop - keep:self._stop]
+            self._start, self._stop = 0, keep
+        self._timestamps[self._stop:self._stop + count] = timestamps
+        self._values[self._stop:self._stop + count] = values
+        self._stop += count
+        self._start = max(self._start, self._stop - self.capacity)
+
+    def clear(self):
+        self._start = self._stop = 0
+
+    def latest_time(self):
+        return self._timestamps[self._stop - 1]
+
+    def since(self, t_min):
+        timestamps = self._timestamps[self._start:self._stop]
+        first = np.searchsorted(timestamps, t_min)
+        return timestamps[first:], self._values[self._start + first:self._stop]
+
+
+def minmax_decimate(timestamps, values, n_bins):
+    # Reduce (N, channels) samples to at most 2 * n_bins points per channel, keeping each bin's
+    # minimum and maximum so peaks survive. Returns the input untouched if it is already small enough.
+    n = len(timestamps)
+    if n <= 2 * n_bins:
+        return timestamps, values
+    k = n // n_bins
+    offset = n - k * n_bins  # Drop the few oldest samples that do not fill a bin
+    binned = values[offset:].reshape(n_bins, k, -1)
+    x = np.empty(2 * n_bins)
+    y = np.empty((2 * n_bins, values.shape[1]))
+    x[0::2] = timestamps[offset::k]
+    x[1::2] = timestamps[offset + k - 1::k]
+    y[0::2] = binned.min(axis=1)
+    y[1::2] = binned.max(axis=1)
+    return x, y
+
+
+class LivePlot:
+    # Scrolling plot of the four channels embedded in a Tk frame.
+    # Lines are redrawn with blitting at a fixed frame rate; the number of points drawn is tied to
+    # the axes width in pixels, not to the sample rate. Main-thread CPU spent rendering is measured
+    # and the frame rate is lowered if it goes over cpu_budget (fraction of one core).
+
+    def __init__(self, parent, window_seconds=10.0, fps=20, cpu_budget=0.10, capacity=65536):
+        self.window_seconds = window_seconds
+        self.fps = fps
+        self.target_fps = fps
+        self.cpu_budget = cpu_budget
+        self.samples = SampleWindow(capacity)
+        self.is_running = False
+        self.cpu_fraction = 0.0
+        self._after_id = None
+        self._background = None
+        self._render_cpu = 0.0
+        self._measure_start = 0.0
+
+        self.frame = ttk.Frame(parent)
+        self.figure = Figure(figsize=(6, 4), dpi=100)
+        self.ax = self.figure.add_subplot(111)
+        self.ax.set_xlim(-window_seconds, 0)
+        self.ax.set_ylim(-100, 1000)
+        self.ax.set_xlabel('Time (seconds)')
+        self.ax.set_ylabel('Force (grams)')
+        self.lines = [self.ax.plot([], [], label=name, animated=True)[0] for name in CHANNEL_NAMES]
+        self.ax.legend(loc='upper left')
+
+        self.canvas = FigureCanvasTkAgg(self.figure, master=self.frame)
+        self.canvas.get_tk_widget().pack(fill='both', expand=True)
+        self.canvas.mpl_connect('draw_event', self._on_draw)
+        self.stats_text = ttk.Label(self.frame, text="")
+        self.stats_text.pack()
+
+    def _on_draw(self, event):
+        # Cache everything except the lines; blitting restores this instead of redrawing the axes
+        self._background = self.canvas.copy_from_bbox(self.ax.bbox)
+        for line in self.lines:
+            self.ax.draw_artist(line)
+
+    def add_samples(self, timestamps, values):
+        self.samples.add(timestamps, values)
+
+    def start(self):
+        if self.is_running:
+            return
+        self.is_running = True
+        self.fps = self.target_fps
+        self._measure_start = time.perf_counter()
+        self._render_cpu = 0.0
+        self.canvas.draw()
+        self._schedule()
+
+    def stop(self):
+        self.is_running = False
+        if self._after_id is not None:
+            self.frame.after_cancel(self._after_id)
+            self._after_id = None
+
+    def _schedule(self):
+        self._after_id = self.frame.after(int(1000 / self.fps), self._tick)
+
+    def _tick(self):
+        if not self.is_running:
+            return
+        cpu_start = time.thread_time()
+        self.render()
+        self._render_cpu += time.thread_time() - cpu_start
+        self._update_budget()
+        self._schedule()
+
+    def render(self):
+        if self._background is None or not len(self.samples):
+            return
+        timestamps, values = self.samples.since(self.samples.latest_time() - self.window_seconds)
+        n_bins = max(int(self.ax.bbox.width), 1)
+        x, y = minmax_decimate(timestamps, values, n_bins)
+        x = x - timestamps[-1]
+
+        low, high = self.ax.get_ylim()
+        if len(y) and (y.min() < low or y.max() > high):
+            # Out of range: rescale once with some headroom and redraw the static parts
+            span = max(y.max() - y.min(), 1.0)
+            self.ax.set_ylim(min(low, y.min() - 0.1 * span), max(high, y.max() + 0.1 * span))
+            for line, column in zip(self.lines, y.T):
+                line.set_data(x, column)
+            self.canvas.draw()
+            return
+
+        self.canvas.restore_region(self._background)
+        for line, column in zip(self.lines, y.T):
+            line.set_data(x, column)
+            self.ax.draw_artist(line)
+        self.canvas.blit(self.ax.bbox)
+
+    def _update_budget(self):
+        wall = time.perf_counter() - self._measure_start
+        if wall < 1.0:
+            return
+        self.cpu_fraction = self._render_cpu / wall
+        # Halve the frame rate while over budget; creep back up once well under it
+        if self.cpu_fraction > self.cpu_budget and self.fps > 1:
+            self.fps = max(1, self.fps // 2)
+        elif self.cpu_fraction < self.cpu_budget / 2 and self.fps < self.target_fps:
+            self.fps = min(self.target_fps, self.fps + 1)
+        self.stats_text.config(text=f"{self.fps} fps, render CPU {self.cpu_fraction * 100:.1f}% of one core")
+        self._measure_start = time.perf_counter()
+        self._render_cpu = 0.0
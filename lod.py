@@ -0,0 +1,87 @@
+import numpy as np
+
+LOD_BASE = 32  # Raw samples per bin of the finest level
+LOD_FACTOR = 8  # Bins of one level per bin of the next
+LOD_DTYPE = np.float32  # Exact for 24-bit ADC counts, and plenty for display
+
+
+def reduce_bins(t, low, high, mean, size):
+    # Combine every `size` consecutive rows into one bin: first time, min of the lows, max of the
+    # highs, mean of the means. Returns the bins and the rows left over (fewer than `size`).
+    n = len(t) // size * size
+    channels = low.shape[1]
+    bins = (t[:n:size],
+            low[:n].reshape(-1, size, channels).min(axis=1),
+            high[:n].reshape(-1, size, channels).max(axis=1),
+            mean[:n].reshape(-1, size, channels).mean(axis=1))
+    rest = (t[n:], low[n:], high[n:], mean[n:])
+    return bins, rest
+
+
+def _concat(a, b):
+    return tuple(np.concatenate((x, y)) for x, y in zip(a, b))
+
+
+class LodPyramid:
+    # Incremental min/max/mean pyramid over an (N, channels) sample stream, for viewing long
+    # recordings at the resolution of the screen. Level 0 bins hold `base` raw samples and each level
+    # above combines `factor` bins of the one below. add() takes blocks of any size and returns the
+    # bins completed at each level; rows short of a full bin are carried over to the next block.
+
+    def __init__(self, n_channels=4, base=LOD_BASE, factor=LOD_FACTOR):
+        self.n_channels = n_channels
+        self.base = base
+        self.factor = factor
+        self._pending = [self._empty()]  # Per level, rows waiting for a full bin
+
+    def _empty(self):
+        return (np.empty(0), *(np.empty((0, self.n_channels)) for _ in range(3)))
+
+    def bin_size(self, level):
+        # Raw samples per bin at `level`
+        return self.base * self.factor ** level
+
+    def add(self, timestamps, values):
+        # Returns [(level, (t, low, high, mean)), ...] for the levels that completed bins
+        values = np.asarray(values, dtype=np.float64)
+        rows = (np.asarray(timestamps, dtype=np.float64), values, values, values)
+        out = []
+        level = 0
+        while True:
+            if level == len(self._pending):
+                self._pending.append(self._empty())
+            rows = _concat(self._pending[level], rows)
+            bins, self._pending[level] = reduce_bins(*rows, self.base if level == 0 else self.factor)
+            if not len(bins[0]):
+                return out
+            out.append((level, bins))
+            rows = bins
+            level += 1
+
+    def finish(self):
+        # Partial last bins at every level, so the end of the recording is covered too. Their means
+        # weight the bins below equally, which is close enough for display.
+        out = []
+        carry = None
+        for level, pending in enumerate(self._pending):
+            rows = pending if carry is None else _concat(pending, carry)
+            if not len(rows[0]):
+                carry = None
+                continue
+            bins, _ = reduce_bins(*rows, len(rows[0]))
+            out.append((level, bins))
+            carry = bins
+        self._pending = [self._empty()]
+        return out
+
+
+def choose_level(n_visible, width, n_levels, base=LOD_BASE, factor=LOD_FACTOR):
+    # Level to draw n_visible raw samples on `width` pixels: None for the raw samples while there are
+    # few enough, otherwise the coarsest level that still gives at least one bin per two pixels
+    if n_visible <= 4 * width or not n_levels:
+        return None
+    level = 0
+    while level + 1 < n_levels and n_visible / (base * factor ** (level + 1)) >= width / 2:
+        level += 1
+    return level
+
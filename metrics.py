@@ -0,0 +1,103 @@
+import threading
+import time
+
+import numpy as np
+
+# Inter-sample interval histogram bin edges, in milliseconds
+INTERVAL_EDGES_MS = np.array([0, 0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, np.inf])
+
+
+class AcquisitionMetrics:
+    # Health counters for the acquisition hot path. Updated once per sample block or read, never per
+    # sample, so the cost does not grow with the sample rate. reset() starts a new measurement
+    # (e.g. at the start of a recording); snapshot() returns a plain dict for display or saving.
+
+    def __init__(self, gap_factor=5.0, rate_window=1.0):
+        self.gap_factor = gap_factor  # An interval this many times the typical one counts as a gap
+        self.rate_window = rate_window  # Seconds over which the current rate is measured
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.start_time = time.monotonic()
+            self.samples = 0
+            self.parse_failures = 0
+            self.gaps = 0
+            self.max_gap = 0.0
+            self.interval_counts = np.zeros(len(INTERVAL_EDGES_MS) - 1, dtype=np.int64)
+            self.reads = 0
+            self.lock_hold_total = 0.0
+            self.max_lock_hold = 0.0
+            self.max_backlog = 0
+            self.max_queue_depth = 0
+            self.current_hz = 0.0
+            self._last_timestamp = None
+            self._typical_interval = None
+            self._window_start = self.start_time
+            self._window_samples = 0
+
+    def record_block(self, timestamps):
+        with self._lock:
+            if self._last_timestamp is not None:
+                intervals = np.diff(timestamps, prepend=self._last_timestamp)
+            else:
+                intervals = np.diff(timestamps)
+            self._last_timestamp = timestamps[-1]
+            self.samples += len(timestamps)
+            self._window_samples += len(timestamps)
+            if len(intervals):
+                self.interval_counts += np.histogram(intervals * 1e3, bins=INTERVAL_EDGES_MS)[0]
+                if self._typical_interval is not None:
+                    gaps = intervals[intervals > self.gap_factor * self._typical_interval]
+                    self.gaps += len(gaps)
+                    if len(gaps):
+                        self.max_gap = max(self.max_gap, float(gaps.max()))
+            now = time.monotonic()
+            if now - self._window_start >= self.rate_window:
+                self.current_hz = self._window_samples / (now - self._window_start)
+                self._window_start = now
+                self._window_samples = 0
+                if self.current_hz > 0:
+                    self._typical_interval = 1 / self.current_hz
+
+    def record_read(self, lock_hold, backlog):
+        # lock_hold in seconds; backlog is the serial input buffer size seen before the read
+        with self._lock:
+            self.reads += 1
+            self.lock_hold_total += lock_hold
+            self.max_lock_hold = max(self.max_lock_hold, lock_hold)
+            self.max_backlog = max(self.max_backlog, backlog)
+
+    def record_parse_failure(self):
+        with self._lock:
+            self.parse_failures += 1
+
+    def record_queue_depth(self, depth):
+        if depth > self.max_queue_depth:
+            self.max_queue_depth = depth
+
+    def snapshot(self):
+        with self._lock:
+            elapsed = time.monotonic() - self.start_time
+            return {
+                'samples': self.samples,
+                'effective_hz': self.samples / elapsed if elapsed > 0 else 0.0,
+                'current_hz': self.current_hz,
+                'parse_failures': self.parse_failures,
+                'gaps': self.gaps,
+                'max_gap_s': self.max_gap,
+                'interval_hist_counts': self.interval_counts.copy(),
+                'interval_hist_edges_ms': INTERVAL_EDGES_MS,
+                'mean_lock_hold_ms': self.lock_hold_total / self.reads * 1e3 if self.reads else 0.0,
+                'max_lock_hold_ms': self.max_lock_hold * 1e3,
+                'max_backlog_bytes': self.max_backlog,
+                'max_queue_depth': self.max_queue_depth,
+            }
+
+    def summary(self):
+        # One line for the status area
+        stats = self.snapshot()
+        return (f"{stats['current_hz']:.0f} Hz | gaps {stats['gaps']} (max {stats['max_gap_s'] * 1e3:.0f} ms) | "
+                f"bad lines {stats['parse_failures']} | backlog {stats['max_backlog_bytes']} B | "
+                f"lock {stats['max_lock_hold_ms']:.1f} ms | queue {stats['max_queue_depth']}")
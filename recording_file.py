@@ -0,0 +1,559 @@
+import os
+import threading
+import time
+
+import h5py
+import numpy as np
+
+from calibration import CalibrationModel, RunningStats
+from gait import CYCLE_DTYPE, cycle_summary
+from lod import LOD_DTYPE, LodPyramid, choose_level
+from sample_buffer import SampleBuffer, CHANNELS
+
+# On-disk layouts. 'channels': one (N, 2) timestamp/value float64 dataset per channel, as in the
+# original files. 'compact': one 'time' dataset and one (N, 4) 'force' dataset of a selectable dtype,
+# optionally compressed.
+LAYOUT_CHANNELS = 'channels'
+LAYOUT_COMPACT = 'compact'
+COMPRESSIONS = (None, 'gzip', 'lzf')
+
+
+class PendingTables:
+    # Rows of small structured tables (gait cycles, hand dynamometer samples) waiting for the next flush.
+    # Producers on any thread only append to a list under the lock; the flush thread swaps the lists
+    # out and appends them to resizable compound datasets, each created with its first rows.
+
+    def __init__(self):
+        self._rows = {}
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def add(self, name, rows):
+        with self._lock:
+            if not self._closed and len(rows):
+                self._rows.setdefault(name, []).append(rows)
+
+    def swap(self):
+        with self._lock:
+            pending, self._rows = self._rows, {}
+        return pending
+
+    def write(self, parent):
+        for name, parts in self.swap().items():
+            append_table(parent, name, np.concatenate(parts))
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+
+
+class SampleStream:
+    # Samples of one walker in a StreamingH5Writer: the file root, or one group in a multi-walker file.
+    # Each stream has its own batch and lock, so walkers appending from their own reader threads never
+    # wait for each other, only for the pointer swap of their own batch. A min/max/mean pyramid for
+    # viewing is built alongside as the batches are written, and gait cycles found during the recording
+    # are appended to a 'cycles' table with the same flushes. Per-channel mean, std, min and max of the
+    # stored values are kept too, so a session can be summarized without reading its samples.
+    # In the compact layout the last partial chunk (fewer than chunk_rows rows) is written with every
+    # flush, so a crash loses at most one flush interval, and rewritten by the next flush that adds to
+    # it; its rows are also kept in memory for that. Full chunks are written once and never touched again.
+
+    def __init__(self, name, chunk_rows, attrs=None, layout=LAYOUT_CHANNELS, dtype=np.float64, compression=None):
+        self.name = name
+        self.chunk_rows = chunk_rows
+        self.attrs = dict(attrs or {})
+        self.layout = layout
+        self.dtype = np.dtype(dtype)
+        self.compression = compression
+        self.n_samples = 0
+        self.n_written = 0
+        self._unwritten = (np.empty(0), np.empty((0, len(CHANNELS))))
+        self.gaps = []  # (start, stop) of outages in recording time
+        self.datasets = {}
+        self.lod = LodPyramid(len(CHANNELS))
+        self.lod_group = None
+        self.stats = RunningStats(len(CHANNELS))
+        self.minimum = np.full(len(CHANNELS), np.inf)
+        self.maximum = np.full(len(CHANNELS), -np.inf)
+        self.parent = None
+        self.tables = PendingTables()
+        self._pending = SampleBuffer(chunk_size=chunk_rows)
+        self._spare = SampleBuffer(chunk_size=chunk_rows)
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def append(self, timestamp, values):
+        with self._lock:
+            if not self._closed:
+                self._pending.append(timestamp, values)
+
+    def extend(self, timestamps, values):
+        with self._lock:
+            if not self._closed:
+                self._pending.extend(timestamps, values)
+
+    def add_cycles(self, cycles):
+        # Completed gait cycles (gait.CYCLE_DTYPE rows, start in recording time)
+        self.tables.add('cycles', cycles)
+
+    def mark_gap(self, start, stop):
+        # Outage such as a serial disconnect, saved as the 'gaps' dataset when the file is closed
+        with self._lock:
+            self.gaps.append((start, stop))
+
+    def create(self, parent):
+        self.parent = parent
+        if self.layout == LAYOUT_COMPACT:
+            filters = {'compression': self.compression, 'shuffle': self.compression is not None}
+            self.datasets['time'] = parent.create_dataset('time', shape=(0,), maxshape=(None,), dtype=np.float64,
+                                                          chunks=(self.chunk_rows,), **filters)
+            self.datasets['force'] = parent.create_dataset('force', shape=(0, len(CHANNELS)),
+                                                           maxshape=(None, len(CHANNELS)), dtype=self.dtype,
+                                                           chunks=(self.chunk_rows, len(CHANNELS)), **filters)
+            self.datasets['force'].attrs['channels'] = CHANNELS
+            parent.attrs['layout'] = LAYOUT_COMPACT
+        else:
+            for key in CHANNELS:
+                # Same (N, 2) timestamp/value layout as the files written by save_data
+                self.datasets[key] = parent.create_dataset(key, shape=(0, 2), maxshape=(None, 2),
+                                                           dtype=np.float64, chunks=(self.chunk_rows, 2))
+        for name, value in self.attrs.items():
+            parent.attrs[name] = value
+        self.lod_group = create_lod_group(parent, self.lod)
+
+    def swap(self):
+        # Swap the batches so the acquisition thread only waits for a pointer swap
+        with self._lock:
+            batch, self._pending = self._pending, self._spare
+        return batch
+
+    def write(self, batch):
+        if self.layout == LAYOUT_COMPACT:
+            timestamps = np.concatenate((self._unwritten[0], batch.timestamps))
+            values = np.concatenate((self._unwritten[1], batch.values))
+            n = len(timestamps) // self.chunk_rows * self.chunk_rows
+            self._write_rows(timestamps, values)
+            self.n_written -= len(timestamps) - n  # The next write starts over at the partial chunk
+            self._unwritten = (timestamps[n:], values[n:])
+        else:
+            self._write_rows(batch.timestamps, batch.values)
+        self.n_samples += len(batch)
+        self.stats.update(batch.values)
+        self.minimum = np.minimum(self.minimum, batch.values.min(axis=0))
+        self.maximum = np.maximum(self.maximum, batch.values.max(axis=0))
+        write_lod(self.lod_group, self.lod.add(batch.timestamps, batch.values))
+
+    def _write_rows(self, timestamps, values):
+        start = self.n_written
+        stop = start + len(timestamps)
+        if stop == start:
+            return
+        if self.layout == LAYOUT_COMPACT:
+            if self.dtype.kind in 'iu':
+                values = np.rint(values)
+            self.datasets['time'].resize((stop,))
+            self.datasets['time'][start:stop] = timestamps
+            self.datasets['force'].resize(stop, axis=0)
+            self.datasets['force'][start:stop] = values.astype(self.dtype)
+        else:
+            for index, key in enumerate(CHANNELS):
+                dataset = self.datasets[key]
+                dataset.resize((stop, 2))
+                dataset[start:stop, 0] = timestamps
+                dataset[start:stop, 1] = values[:, index]
+        self.n_written = stop
+
+    def finish(self):
+        # The last pyramid bins and tables; called once the flush thread has stopped
+        self.tables.write(self.parent)
+        self.n_written += len(self._unwritten[0])  # The partial chunk is already on disk
+        self._unwritten = (np.empty(0), np.empty((0, len(CHANNELS))))
+        write_lod(self.lod_group, self.lod.finish())
+
+    def stats_attrs(self):
+        # In the stored units (raw counts or grams); empty for a recording without samples
+        if not self.stats.count:
+            return {}
+        return {'stats_mean': self.stats.mean, 'stats_std': self.stats.std,
+                'stats_min': self.minimum, 'stats_max': self.maximum}
+
+    def recycle(self, batch):
+        batch.clear()
+        self._spare = batch
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+        self.tables.close()
+
+
+class StreamingH5Writer:
+    # Streams samples to an HDF5 file while a recording is running.
+    # The acquisition thread appends into an in-memory batch; a background thread swaps the
+    # batch out every flush_interval seconds and appends it to chunked, resizable datasets.
+    # Memory use is bounded by one flush interval of samples, however long the session runs.
+    # With `groups` ({name: attrs}) each walker gets its own group and stream(name); a single thread
+    # writes all of them, since HDF5 serializes writes to one file anyway. Otherwise the channels are
+    # at the file root and append/extend/mark_gap write to them directly.
+    # layout, dtype and compression select the on-disk format (see LAYOUT_COMPACT). Integer dtypes
+    # are only allowed for raw counts, which are whole numbers; 24-bit counts fit float32 exactly too.
+    # add_rows() appends to tables at the file root that belong to no walker, such as the hand
+    # dynamometer samples.
+
+    def __init__(self, filename, flush_interval=1.0, chunk_rows=4096, attrs=None, groups=None,
+                 layout=LAYOUT_CHANNELS, dtype=np.float64, compression=None):
+        self.filename = filename
+        self.flush_interval = flush_interval
+        self.chunk_rows = chunk_rows
+        self.attrs = dict(attrs or {})
+        self.error = None
+        dtype = np.dtype(dtype)
+        if layout not in (LAYOUT_CHANNELS, LAYOUT_COMPACT):
+            raise ValueError(f"Unknown layout {layout!r}")
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"Unknown compression {compression!r}")
+        if layout == LAYOUT_CHANNELS and (dtype != np.float64 or compression is not None):
+            raise ValueError("The channels layout is always uncompressed float64; use the compact layout")
+        if dtype.kind in 'iu' and not self.attrs.get('raw_counts', False):
+            raise ValueError("Integer samples need raw counts; calibrated values are fractional")
+        options = {'layout': layout, 'dtype': dtype, 'compression': compression}
+        if groups is None:
+            self._streams = {None: SampleStream(None, chunk_rows, **options)}
+        else:
+            self._streams = {name: SampleStream(name, chunk_rows, group_attrs, **options)
+                             for name, group_attrs in groups.items()}
+        self.tables = PendingTables()
+        self._file = None
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def stream(self, name=None):
+        return self._streams[name]
+
+    @property
+    def n_samples(self):
+        return sum(stream.n_samples for stream in self._streams.values())
+
+    @property
+    def gaps(self):
+        return self.stream().gaps
+
+    def open(self):
+        self._file = h5py.File(self.filename, 'w')
+        for name, stream in self._streams.items():
+            stream.create(self._file if name is None else self._file.create_group(name))
+        for name, value in self.attrs.items():
+            self._file.attrs[name] = value
+        self._file.attrs['start_time'] = time.time()
+        self._file.flush()
+
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def append(self, timestamp, values):
+        self.stream().append(timestamp, values)
+
+    def extend(self, timestamps, values):
+        self.stream().extend(timestamps, values)
+
+    def mark_gap(self, start, stop):
+        self.stream().mark_gap(start, stop)
+
+    def add_rows(self, name, rows):
+        self.tables.add(name, rows)
+
+    def _run(self):
+        while not self._stop_event.wait(self.flush_interval):
+            self._write_pending()
+        self._write_pending()
+
+    def _write_pending(self):
+        for stream in self._streams.values():
+            batch = stream.swap()
+            tables = stream.tables.swap()
+            try:
+                if len(batch) and self.error is None:
+                    stream.write(batch)
+                for name, parts in tables.items():
+                    if self.error is None:
+                        append_table(stream.parent, name, np.concatenate(parts))
+            except Exception as e:  # Surfaced to the app through self.error
+                self.error = e
+                print("HDF5 stream error:", e)
+            finally:
+                stream.recycle(batch)
+        tables = self.tables.swap()
+        try:
+            for name, parts in tables.items():
+                if self.error is None:
+                    append_table(self._file, name, np.concatenate(parts))
+            if self.error is None:
+                self._file.flush()
+        except Exception as e:
+            self.error = e
+            print("HDF5 stream error:", e)
+
+    def close(self, attrs=None, group_attrs=None):
+        # group_attrs: {name: attrs} for the walker groups, e.g. each walker's acquisition health
+        for stream in self._streams.values():
+            stream.close()
+        self.tables.close()
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+        if self._file is None:
+            return
+        # Stopping only has to write the remaining batch and the session metadata
+        for name, value in (attrs or {}).items():
+            self._file.attrs[name] = value
+        for name, stream in self._streams.items():
+            parent = self._file if name is None else self._file[name]
+            for attr, value in (group_attrs or {}).get(name, {}).items():
+                parent.attrs[attr] = value
+            try:
+                if self.error is None:
+                    stream.finish()
+            except Exception as e:
+                self.error = e
+                print("HDF5 stream error:", e)
+            if stream.gaps:
+                parent.create_dataset('gaps', data=np.array(stream.gaps, dtype=np.float64))
+            if 'cycles' in parent:
+                for attr, value in cycle_summary(parent['cycles'][:]).items():
+                    parent.attrs[attr] = value
+            parent.attrs['n_samples'] = stream.n_written
+            for attr, value in stream.stats_attrs().items():
+                parent.attrs[attr] = value
+        try:
+            if self.error is None:
+                self.tables.write(self._file)
+        except Exception as e:
+            self.error = e
+            print("HDF5 stream error:", e)
+        self._file.attrs['stop_time'] = time.time()
+        self._file.close()
+        self._file = None
+
+
+def create_lod_group(parent, pyramid):
+    lod = parent.create_group('lod')
+    lod.attrs['base'] = pyramid.base
+    lod.attrs['factor'] = pyramid.factor
+    return lod
+
+
+def append_table(parent, name, rows):
+    # Append structured rows to a resizable compound dataset, created with the first rows
+    if name not in parent:
+        parent.create_dataset(name, shape=(0,), maxshape=(None,), dtype=rows.dtype, chunks=(1024,))
+    dataset = parent[name]
+    start = len(dataset)
+    dataset.resize((start + len(rows),))
+    dataset[start:] = rows
+
+
+def write_lod(lod, levels):
+    # Append pyramid bins ([(level, (t, low, high, mean)), ...]) to the lod/level<k> datasets
+    for level, bins in levels:
+        name = f'level{level}'
+        if name not in lod:
+            group = lod.create_group(name)
+            group.create_dataset('time', shape=(0,), maxshape=(None,), dtype=np.float64, chunks=(4096,))
+            for key in ('min', 'max', 'mean'):
+                group.create_dataset(key, shape=(0, len(CHANNELS)), maxshape=(None, len(CHANNELS)),
+                                     dtype=LOD_DTYPE, chunks=(4096, len(CHANNELS)))
+        group = lod[name]
+        start = len(group['time'])
+        stop = start + len(bins[0])
+        for key, data in zip(('time', 'min', 'max', 'mean'), bins):
+            group[key].resize(stop, axis=0)
+            group[key][start:stop] = data
+
+
+def build_lod(node, block_rows=1 << 20):
+    # The viewing pyramid of a recording written before it was built during recording, as a 'lod'
+    # group in an in-memory HDF5 file (about 2 bytes per sample). The recording is only read: viewing
+    # an archived file must not modify it, or change its mtime for the session catalog.
+    memory = h5py.File(f'lod-{id(node)}.h5', 'w', driver='core', backing_store=False)
+    pyramid = LodPyramid(len(CHANNELS))
+    lod = create_lod_group(memory, pyramid)
+    n = recording_length(node)
+    for start in range(0, n, block_rows):
+        write_lod(lod, pyramid.add(*read_samples(node, start, min(start + block_rows, n))))
+    write_lod(lod, pyramid.finish())
+    return lod
+
+
+def is_recording_node(node):
+    return 'force' in node or CHANNELS[0] in node
+
+
+def recording_length(node):
+    if 'force' in node:
+        return min(len(node['time']), len(node['force']))
+    return min(len(node[key]) for key in CHANNELS)
+
+
+def read_samples(node, start=0, stop=None):
+    # (timestamps, (N, 4) float64 values) for rows start..stop of a recording file or walker group, as
+    # stored. Understands both layouts, so files from before the compact layout read the same.
+    if 'force' in node:
+        timestamps = node['time'][start:stop]
+        values = node['force'][start:stop].astype(np.float64)
+        n = min(len(timestamps), len(values))
+        return timestamps[:n], values[:n]
+    columns = [node[key][start:stop] for key in CHANNELS]
+    n = min(len(column) for column in columns)
+    return columns[0][:n, 0], np.column_stack([column[:n, 1] for column in columns])
+
+
+class RecordingView:
+    # Reads a recording at the resolution a plot needs. Long stretches come from the coarsest pyramid
+    # level that still gives about a bin per screen pixel, short ones from the raw samples, so the
+    # cost of a redraw depends on the plot width rather than on the length of the session.
+    # Recordings from before the pyramid get one built in memory when opened (build_lod); without
+    # it, long stretches are read with a stride through the samples.
+
+    def __init__(self, filename, group=None, model=None, build_missing_lod=True):
+        self._file = h5py.File(filename, 'r')
+        self.node = self._file if group is None else self._file[group]
+        attrs = dict(self._file.attrs)
+        attrs.update(self.node.attrs)
+        self.attrs = attrs
+        self.model = model or (CalibrationModel.from_attrs(attrs) if attrs.get('raw_counts', False) else None)
+        self.n_samples = recording_length(self.node)
+        lod = self.node.get('lod')
+        if lod is None and build_missing_lod and self.n_samples:
+            lod = build_lod(self.node)
+        self.lod = lod
+        self.n_levels = 0 if lod is None else len(lod)
+        self._level_times = {}
+
+    def close(self):
+        if self.lod is not None and self.lod.file != self._file:
+            self.lod.file.close()
+        self._file.close()
+
+    def level_times(self, level):
+        # Bin start times are small (1/32 of the samples at level 0) and cached for the range lookups
+        if level not in self._level_times:
+            self._level_times[level] = self.lod[f'level{level}/time'][:]
+        return self._level_times[level]
+
+    @property
+    def time_range(self):
+        if not self.n_samples:
+            return 0.0, 0.0
+        t, _ = read_samples(self.node, 0, 1)
+        t_last, _ = read_samples(self.node, self.n_samples - 1, self.n_samples)
+        return float(t[0]), float(t_last[0])
+
+    def sample_range(self, t0, t1):
+        # Raw rows covering t0..t1, found through the finest level instead of searching the samples
+        if not self.n_levels:
+            return 0, self.n_samples
+        times = self.level_times(0)
+        first = max(np.searchsorted(times, t0, side='right') - 1, 0)
+        last = np.searchsorted(times, t1, side='right')
+        base = self.lod.attrs['base']
+        return int(first * base), int(min(last * base, self.n_samples))
+
+    def _calibrate(self, values):
+        return values if self.model is None else self.model.apply(values)
+
+    def read(self, t0, t1, width):
+        # (t, low, high, mean) for t0..t1 drawn on `width` pixels; all three are the same for raw samples
+        start, stop = self.sample_range(t0, t1)
+        level = choose_level(stop - start, width, self.n_levels, self.lod.attrs['base'] if self.lod else 1,
+                             self.lod.attrs['factor'] if self.lod else 1)
+        if level is None:
+            if not self.n_levels and stop - start > 4 * width:
+                # No pyramid (build_missing_lod off): stride through the samples instead
+                step = (stop - start) // (2 * width)
+                t, values = read_samples(self.node, start, stop)
+                t, values = t[::step], values[::step]
+            else:
+                t, values = read_samples(self.node, start, stop)
+            values = self._calibrate(values)
+            return t, values, values, values
+        times = self.level_times(level)
+        first = max(np.searchsorted(times, t0, side='right') - 1, 0)
+        last = np.searchsorted(times, t1, side='right')
+        group = self.lod[f'level{level}']
+        low = self._calibrate(group['min'][first:last])
+        high = self._calibrate(group['max'][first:last])
+        mean = self._calibrate(group['mean'][first:last])
+        # A negative gain swaps which end of the bin is the minimum
+        return times[first:last], np.minimum(low, high), np.maximum(low, high), mean
+
+
+def load_cycles(filename, group=None):
+    # The gait cycles table of a recording (gait.CYCLE_DTYPE), empty for files recorded without it
+    with h5py.File(filename, 'r') as f:
+        node = f if group is None else f[group]
+        return node['cycles'][:] if 'cycles' in node else np.empty(0, dtype=CYCLE_DTYPE)
+
+
+def recording_groups(filename):
+    # Walker groups of a multi-walker recording in --port order (walker2 before walker10); empty for
+    # single-walker files
+    with h5py.File(filename, 'r') as f:
+        names = [name for name, item in f.items() if isinstance(item, h5py.Group) and is_recording_node(item)]
+    return sorted(names, key=lambda name: (len(name), name))
+
+
+def load_recording(filename, calibrated=True, model=None, group=None):
+    # Read a recording back into a SampleBuffer, returning (buffer, attrs).
+    # Files with raw counts are calibrated on the way out with the stored model (or `model`, to try
+    # a different calibration); older files already hold calibrated values and are returned as-is.
+    # `group` selects one walker of a multi-walker file; its attrs are merged over the file's.
+    with h5py.File(filename, 'r') as f:
+        node = f if group is None else f[group]
+        attrs = dict(f.attrs)
+        attrs.update(node.attrs)
+        timestamps, values = read_samples(node)
+    n = len(timestamps)
+    if calibrated and attrs.get('raw_counts', False):
+        values = (model or CalibrationModel.from_attrs(attrs)).apply(values)
+    data = SampleBuffer(chunk_size=max(n, 1))
+    if n:
+        data.extend(timestamps, values)
+    return data, attrs
+
+
+def recalibrate_recording(filename, model, group=None):
+    # Replace the calibration stored with a raw-count recording; the samples themselves are untouched
+    with h5py.File(filename, 'r+') as f:
+        if not f.attrs.get('raw_counts', False):
+            raise ValueError(f"{filename} stores calibrated values, not raw counts")
+        node = f if group is None else f[group]
+        for name in [name for name in node.attrs if name.startswith('calibration_')]:
+            del node.attrs[name]
+        for name, value in model.to_attrs().items():
+            node.attrs[name] = value
+        node.attrs['recalibrated_time'] = time.time()
+
+
+def load_calibration(filename, group=None):
+    # The calibration model saved with a recording, e.g. to reuse it for an unattended session
+    with h5py.File(filename, 'r') as f:
+        if group is not None and group not in f:
+            raise ValueError(f"{filename} has no group {group}")
+        model = CalibrationModel.from_attrs(dict(f.attrs if group is None else f[group].attrs))
+    if model is None:
+        raise ValueError(f"{filename}{'' if group is None else ':' + group} has no stored calibration")
+    return model
+
+
+def load_calibrations(spec):
+    # Calibration models from FILE or FILE:GROUP. Without a group a multi-walker recording gives one
+    # model per walker, in --port order, and a single-walker recording gives one.
+    filename, group = spec, None
+    if not os.path.exists(spec) and ':' in spec:
+        filename, _, group = spec.rpartition(':')
+    if group is None:
+        groups = recording_groups(filename)
+        if groups:
+            return [load_calibration(filename, name) for name in groups]
+    return [load_calibration(filename, group)]
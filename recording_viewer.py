@@ -0,0 +1,52 @@
+import matplotlib.pyplot as plt
+
+from recording_file import RecordingView
+from sample_buffer import CHANNEL_NAMES
+
+
+class RecordingViewer:
+    # Plot window for a finished recording. Only the visible time range is read, at the resolution of
+    # the plot (see RecordingView), and it is read again whenever the user pans or zooms. Zoomed out,
+    # each channel is its mean with the min/max range shaded behind it; zoomed in, the raw samples.
+
+    def __init__(self, filename, group=None):
+        self.view = RecordingView(filename, group)
+        self.figure, self.ax = plt.subplots(figsize=(10, 6))
+        self.lines = [self.ax.plot([], [], label=name)[0] for name in CHANNEL_NAMES]
+        self.bands = [None] * len(self.lines)
+        self.ax.set_xlabel('Time (seconds)')
+        self.ax.set_ylabel('Force (grams)' if self.view.model is not None or not self.view.attrs.get('raw_counts')
+                           else 'Counts')
+        self.ax.set_title('Force Data Over Time')
+        self.ax.legend(loc='upper right')
+
+        t0, t1 = self.view.time_range
+        self.refresh(t0, t1)
+        self.ax.set_xlim(t0, t1)
+        self.ax.relim()
+        self.ax.autoscale_view(scalex=False)
+        self.ax.callbacks.connect('xlim_changed', self.on_xlim_changed)
+        self.figure.canvas.mpl_connect('close_event', lambda event: self.view.close())
+
+    def refresh(self, t0, t1):
+        t, low, high, mean = self.view.read(t0, t1, max(int(self.ax.bbox.width), 1))
+        is_raw = low is high
+        for index, line in enumerate(self.lines):
+            line.set_data(t, mean[:, index])
+            if self.bands[index] is not None:
+                self.bands[index].remove()
+                self.bands[index] = None
+            if not is_raw:
+                # One filled polygon draws far faster than a vertical stroke per bin
+                self.bands[index] = self.ax.fill_between(t, low[:, index], high[:, index], color=line.get_color(),
+                                                         alpha=0.3, linewidth=0)
+
+    def on_xlim_changed(self, ax):
+        self.refresh(*ax.get_xlim())
+        self.figure.canvas.draw_idle()
+
+
+def show_recording(filename, group=None):
+    viewer = RecordingViewer(filename, group)
+    plt.show()
+    return viewer
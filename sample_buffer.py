@@ -0,0 +1,81 @@
+import numpy as np
+
+# Channel keys used in the HDF5 file and the matching display names
+CHANNELS = ('rr', 'rf', 'lr', 'lf')
+CHANNEL_NAMES = ('Right-Rear', 'Right-Front', 'Left-Rear', 'Left-Front')
+
+
+class SampleBuffer:
+    # Columnar sample store: one shared timestamp column plus an (N, channels) value array.
+    # Storage is preallocated and grown in chunks, so appending is amortized O(1) and
+    # readers get NumPy views of the filled part without copying.
+
+    def __init__(self, n_channels=len(CHANNELS), chunk_size=65536, dtype=np.float64):
+        self.n_channels = n_channels
+        self.chunk_size = chunk_size
+        self.dtype = dtype
+        self._length = 0
+        self._timestamps = np.empty(chunk_size, dtype=np.float64)
+        self._values = np.empty((chunk_size, n_channels), dtype=dtype)
+
+    def __len__(self):
+        return self._length
+
+    @property
+    def capacity(self):
+        return self._timestamps.shape[0]
+
+    @property
+    def nbytes(self):
+        return self._timestamps.nbytes + self._values.nbytes
+
+    def _reserve(self, needed):
+        capacity = self.capacity
+        if needed <= capacity:
+            return
+        # Grow by at least half the current size, rounded up to whole chunks
+        new_capacity = max(needed, capacity + max(self.chunk_size, capacity // 2))
+        new_capacity = -(-new_capacity // self.chunk_size) * self.chunk_size
+
+        timestamps = np.empty(new_capacity, dtype=np.float64)
+        values = np.empty((new_capacity, self.n_channels), dtype=self.dtype)
+        timestamps[:self._length] = self._timestamps[:self._length]
+        values[:self._length] = self._values[:self._length]
+        # Swap in the new arrays before the length moves, so a reader never sees unfilled rows
+        self._timestamps = timestamps
+        self._values = values
+
+    def append(self, timestamp, values):
+        n = self._length
+        self._reserve(n + 1)
+        self._timestamps[n] = timestamp
+        self._values[n] = values
+        self._length = n + 1
+
+    def extend(self, timestamps, values):
+        values = np.asarray(values, dtype=self.dtype).reshape(-1, self.n_channels)
+        count = values.shape[0]
+        if count == 0:
+            return
+        n = self._length
+        self._reserve(n + count)
+        self._timestamps[n:n + count] = timestamps
+        self._values[n:n + count] = values
+        self._length = n + count
+
+    def clear(self):
+        # Keep the first chunk around so the next recording does not start from a reallocation
+        self._length = 0
+        if self.capacity > self.chunk_size:
+            self._timestamps = np.empty(self.chunk_size, dtype=np.float64)
+            self._values = np.empty((self.chunk_size, self.n_channels), dtype=self.dtype)
+
+    @property
+    def timestamps(self):
+        n = self._length
+        return self._timestamps[:n]
+
+    @property
+    def values(self):
+        n = self._length
+        return self._values[:n]
@@ -0,0 +1,112 @@
+import numpy as np
+
+# Handshake lines sent by the firmware at startup. The setup line may carry options, e.g.
+#   Finished Setup! mode=binary rate=1000
+STARTING_LINE = "Starting..."
+FINISHED_LINE = "Finished Setup!"
+
+# Binary frame layout (little endian, 22 bytes):
+#   sync     uint16  0x5AA5 (bytes A5 5A)
+#   counter  uint16  sample counter, wraps at 65536
+#   values   4 x int32 raw load cell counts (rr, rf, lr, lf)
+#   checksum uint16  sum of the counter and value bytes, modulo 65536
+SYNC_WORD = 0x5AA5
+SYNC_BYTES = SYNC_WORD.to_bytes(2, 'little')
+FRAME_DTYPE = np.dtype([('sync', '<u2'), ('counter', '<u2'), ('values', '<i4', (4,)), ('checksum', '<u2')])
+FRAME_SIZE = FRAME_DTYPE.itemsize
+_PAYLOAD = slice(2, FRAME_SIZE - 2)
+
+
+def parse_text_line(line):
+    # "rr,rf,lr,lf" -> tuple of floats; raises ValueError on anything else
+    rr, rf, lr, lf = map(float, line.split(','))
+    return rr, rf, lr, lf
+
+
+def parse_handshake(line):
+    # Options advertised on the "Finished Setup!" line; plain firmware means text mode
+    options = {'mode': 'text'}
+    for token in line[len(FINISHED_LINE):].split():
+        key, _, value = token.partition('=')
+        options[key.lower()] = value
+    return options
+
+
+def frame_checksum(payload):
+    return sum(payload) & 0xFFFF
+
+
+def encode_frames(counters, values):
+    # Used by the firmware simulator and the benchmarks
+    values = np.asarray(values, dtype='<i4').reshape(-1, 4)
+    frames = np.zeros(len(values), dtype=FRAME_DTYPE)
+    frames['sync'] = SYNC_WORD
+    frames['counter'] = np.asarray(counters, dtype=np.int64) & 0xFFFF
+    frames['values'] = values
+    raw = frames.view(np.uint8).reshape(-1, FRAME_SIZE)
+    frames['checksum'] = raw[:, _PAYLOAD].sum(axis=1, dtype=np.uint32) & 0xFFFF
+    return frames.tobytes()
+
+
+class FrameDecoder:
+    # Decodes a byte stream of binary frames a block at a time.
+    # Whole runs of valid frames are decoded with a single np.frombuffer; on a bad sync word or
+    # checksum the decoder skips ahead to the next sync word and carries on.
+
+    def __init__(self):
+        self._buffer = b''
+        self._last_counter = None
+        self.frames = 0
+        self.resyncs = 0
+        self.dropped_bytes = 0
+        self.lost_frames = 0
+
+    def reset(self):
+        self.__init__()
+
+    def feed(self, data):
+        # Returns (counters, values) for every complete, valid frame in the stream so far
+        buf = self._buffer + data
+        pos = 0
+        blocks = []
+        while True:
+            n = (len(buf) - pos) // FRAME_SIZE
+            if n == 0:
+                break
+            raw = np.frombuffer(buf, dtype=np.uint8, count=n * FRAME_SIZE, offset=pos)
+            frames = raw.view(FRAME_DTYPE)
+            checksums = raw.reshape(n, FRAME_SIZE)[:, _PAYLOAD].sum(axis=1, dtype=np.uint32) & 0xFFFF
+            valid = (frames['sync'] == SYNC_WORD) & (frames['checksum'] == checksums)
+            if valid.all():
+                blocks.append(frames)
+                pos += n * FRAME_SIZE
+                break
+            first_bad = int(np.argmin(valid))
+            if first_bad:
+                blocks.append(frames[:first_bad])
+                pos += first_bad * FRAME_SIZE
+            # Resync on the next sync word after the corrupted frame
+            next_sync = buf.find(SYNC_BYTES, pos + 1)
+            self.resyncs += 1
+            if next_sync < 0:
+                # Keep the last byte in case it is the first half of a sync word
+                next_sync = max(pos, len(buf) - 1)
+            self.dropped_bytes += next_sync - pos
+            pos = next_sync
+        self._buffer = buf[pos:]
+
+        if not blocks:
+            return np.empty(0, dtype=np.uint16), np.empty((0, 4), dtype=np.int32)
+        frames = np.concatenate(blocks) if len(blocks) > 1 else blocks[0]
+        counters = frames['counter'].copy()
+        self._count_lost(counters)
+        self.frames += len(frames)
+        return counters, frames['values'].copy()
+
+    def _count_lost(self, counters):
+        if self._last_counter is not None:
+            steps = np.diff(np.concatenate(([self._last_counter], counters)).astype(np.int64)) & 0xFFFF
+        else:
+            steps = np.diff(counters.astype(np.int64)) & 0xFFFF
+        self.lost_frames += int(np.sum(steps - 1, where=steps > 0))
+        self._last_counter = int(counters[-1])
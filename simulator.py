@@ -0,0 +1,273 @@
+import argparse
+import os
+import threading
+import time
+
+import numpy as np
+import serial
+
+from calibration import DEFAULT_GAINS
+from serial_protocol import STARTING_LINE, FINISHED_LINE, encode_frames
+
+# Port name that makes the app connect to a SimulatedSerial instead of real hardware
+SIMULATED_PORT = "SIMULATOR"
+# Load of the SIMULATOR port (see parse_load); "1" or empty means the default gait pattern
+SIMULATOR_ENV = 'FORCEWALKER_SIMULATOR'
+
+
+def parse_load(text):
+    # Simulated load: 'walk' (gait pattern), 'still' (unloaded, e.g. to tare) or a static load in grams
+    # on every pad ('500' or '500g', e.g. to calibrate). A comma-separated schedule switches load at the
+    # given seconds after power-on: "still,20=500g,40=walk". Returns [(start_seconds, grams or None)].
+    schedule = []
+    for index, item in enumerate(text.split(',')):
+        at, _, spec = item.strip().rpartition('=')
+        try:
+            start = float(at.strip().rstrip('s')) if at else 0.0
+        except ValueError:
+            raise ValueError(f"Unknown simulated load time {at!r}, expected seconds as in 20=500g") from None
+        if index == 0 and start != 0.0:
+            schedule.append((0.0, None))
+        spec = spec.strip().lower()
+        if spec == 'walk':
+            load = None
+        elif spec in ('still', 'unloaded'):
+            load = 0.0
+        else:
+            try:
+                load = float(spec[:-1] if spec.endswith('g') else spec)
+            except ValueError:
+                raise ValueError(f"Unknown simulated load {spec!r}, expected walk, still or grams") from None
+        schedule.append((start, load))
+    return sorted(schedule, key=lambda step: step[0])
+
+
+def simulator_load():
+    # The SIMULATOR port's load schedule from the environment; parsed once when connecting, so a typo
+    # is reported there rather than on the reader thread
+    text = os.environ.get(SIMULATOR_ENV, '').strip()
+    try:
+        return parse_load('walk' if text.lower() in ('', '1', 'true', 'yes') else text)
+    except ValueError as e:
+        raise ValueError(f"{SIMULATOR_ENV}: {e}") from None
+
+
+class WalkerSimulator:
+    # Behaves like the walker firmware: prints the startup handshake, then streams four load cell
+    # channels at `rate` Hz as text lines or binary frames. By default the load follows a simple gait
+    # cycle (alternating left/right loading at `cadence` Hz); `load` can hold the walker still or put a
+    # known weight on it instead, on a schedule (see parse_load), so tare and calibration can be tested.
+    # Gaussian noise is added. Malformed lines and a disconnect after `disconnect_after` seconds can be
+    # injected to exercise error handling.
+
+    def __init__(self, rate=80.0, mode='text', noise=50.0, cadence=0.9, peak_grams=8000.0,
+                 malformed_rate=0.0, startup_delay=0.5, disconnect_after=None, seed=None, load='walk'):
+        self.rate = rate
+        self.mode = mode
+        self.noise = noise
+        self.cadence = cadence
+        self.peak_grams = peak_grams
+        self.schedule = parse_load(load) if isinstance(load, str) else list(load)
+        self.malformed_rate = malformed_rate
+        self.startup_delay = startup_delay
+        self.disconnect_after = disconnect_after
+        self.rng = np.random.default_rng(seed)
+        self.baseline = self.rng.uniform(-20000, 20000, size=4)
+        self.gains = np.asarray(DEFAULT_GAINS)
+        self.samples_sent = 0
+        self.samples_skipped = 0
+        self.started = False
+
+    def handshake(self):
+        options = f" mode=binary rate={self.rate:g}" if self.mode == 'binary' else ""
+        return f"{STARTING_LINE}\r\n{FINISHED_LINE}{options}\r\n".encode()
+
+    def samples(self, first, count):
+        # Raw counts for samples first .. first + count - 1
+        t = (first + np.arange(count)) / self.rate
+        step = np.searchsorted([start for start, _ in self.schedule], t, side='right') - 1
+        grams = np.empty((count, 4))
+        for index, (_, load) in enumerate(self.schedule):
+            rows = step == index
+            if load is not None:
+                grams[rows] = load
+            elif rows.any():
+                phase = 2 * np.pi * self.cadence * t[rows]
+                left = np.clip(np.sin(phase), 0, None)
+                right = np.clip(-np.sin(phase), 0, None)
+                # rr, rf, lr, lf: rear pads take most of the load
+                grams[rows] = self.peak_grams * np.column_stack((0.6 * right, 0.4 * right, 0.6 * left, 0.4 * left))
+        counts = self.baseline + grams * self.gains + self.rng.normal(0, self.noise, size=(count, 4))
+        return np.round(counts)
+
+    def encode(self, first, counts):
+        if self.mode == 'binary':
+            return encode_frames(first + np.arange(len(counts)), counts)
+        lines = []
+        for row in counts.astype(np.int64):
+            if self.malformed_rate and self.rng.random() < self.malformed_rate:
+                lines.append(f"{row[0]},{row[1]},,ERR\r\n")
+            else:
+                lines.append(f"{row[0]},{row[1]},{row[2]},{row[3]}\r\n")
+        return "".join(lines).encode()
+
+    def output_until(self, elapsed):
+        # Bytes the device would have sent by `elapsed` seconds after power-on
+        if elapsed < self.startup_delay:
+            return b''
+        out = b''
+        if not self.started:
+            self.started = True
+            out += self.handshake()
+        due = int((elapsed - self.startup_delay) * self.rate)
+        if due > self.samples_sent:
+            out += self.encode(self.samples_sent, self.samples(self.samples_sent, due - self.samples_sent))
+            self.samples_sent = due
+        return out
+
+    def skip_until(self, elapsed):
+        # Firmware was busy writing: samples that fell due meanwhile are never sent
+        due = int((elapsed - self.startup_delay) * self.rate)
+        if self.started and due > self.samples_sent:
+            self.samples_skipped += due - self.samples_sent
+            self.samples_sent = due
+
+    def sample_due_time(self, index):
+        # Seconds after power-on at which sample `index` leaves the device
+        return self.startup_delay + (index + 1) / self.rate
+
+
+class SimulatedSerial:
+    # Drop-in stand-in for serial.Serial backed by a WalkerSimulator. Bytes become readable in real
+    # time. With a baud rate set, the link carries at most baud / 10 bytes per second and the device
+    # skips samples while its transmit buffer (tx_limit bytes) is full. Like a UART driver, the host
+    # input buffer is bounded too and overflows are counted, not blocked on.
+
+    def __init__(self, simulator=None, timeout=1.0, baud=None, buffer_limit=1 << 16, tx_limit=64):
+        self.simulator = simulator or WalkerSimulator()
+        self.timeout = timeout
+        self.baud = baud
+        self.buffer_limit = buffer_limit
+        self.tx_limit = tx_limit
+        self.port = SIMULATED_PORT
+        self.is_open = True
+        self.overrun_bytes = 0
+        self.start_time = time.monotonic()
+        self._tx = bytearray()
+        self._transmitted = 0
+        self._buffer = bytearray()
+        self._lock = threading.Lock()
+
+    def _elapsed(self):
+        return time.monotonic() - self.start_time
+
+    def _pump(self):
+        elapsed = self._elapsed()
+        disconnect_after = self.simulator.disconnect_after
+        if disconnect_after is not None and elapsed >= disconnect_after:
+            self.is_open = False
+            raise serial.SerialException("simulated device disconnected")
+        if self.baud is not None and len(self._tx) >= self.tx_limit:
+            self.simulator.skip_until(elapsed)
+        else:
+            self._tx += self.simulator.output_until(elapsed)
+        if self.baud is None:
+            self._buffer += self._tx
+            self._tx.clear()
+        else:
+            count = min(len(self._tx), int(elapsed * self.baud / 10) - self._transmitted)
+            self._buffer += self._tx[:count]
+            del self._tx[:count]
+            self._transmitted += count
+        overflow = len(self._buffer) - self.buffer_limit
+        if overflow > 0:
+            del self._buffer[:overflow]
+            self.overrun_bytes += overflow
+
+    @property
+    def in_waiting(self):
+        with self._lock:
+            if not self.is_open:
+                raise serial.SerialException("port is closed")
+            self._pump()
+            return len(self._buffer)
+
+    def read(self, size=1):
+        deadline = time.monotonic() + (self.timeout or 0)
+        while True:
+            with self._lock:
+                if not self.is_open:
+                    raise serial.SerialException("port is closed")
+                self._pump()
+                if len(self._buffer) >= size or time.monotonic() >= deadline:
+                    data = bytes(self._buffer[:size])
+                    del self._buffer[:size]
+                    return data
+            # Sleep until roughly the next sample is due
+            time.sleep(min(1 / self.simulator.rate, max(deadline - time.monotonic(), 0)))
+
+    def readline(self):
+        line = b''
+        while not line.endswith(b'\n'):
+            byte = self.read(1)
+            if not byte:
+                break
+            line += byte
+        return line
+
+    def write(self, data):
+        return len(data)
+
+    def reset_input_buffer(self):
+        with self._lock:
+            self._buffer.clear()
+
+    def close(self):
+        self.is_open = False
+
+
+def run_pty(simulator):
+    # Serve the simulator on a pseudo-terminal so the unmodified app can open it like a real port
+    import tty
+    master, slave = os.openpty()
+    tty.setraw(slave)
+    print(f"Simulated walker on {os.ttyname(slave)} ({simulator.mode}, {simulator.rate:g} Hz). Ctrl+C to stop.")
+    start = time.monotonic()
+    try:
+        while True:
+            elapsed = time.monotonic() - start
+            if simulator.disconnect_after is not None and elapsed >= simulator.disconnect_after:
+                print("Simulated disconnect")
+                break
+            data = simulator.output_until(elapsed)
+            if data:
+                os.write(master, data)
+            time.sleep(min(0.01, 1 / simulator.rate))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        os.close(master)
+        os.close(slave)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulated walker force sensor firmware")
+    parser.add_argument('--rate', type=float, default=80.0, help="samples per second (default: 80)")
+    parser.add_argument('--mode', choices=('text', 'binary'), default='text')
+    parser.add_argument('--noise', type=float, default=50.0, help="noise std in counts (default: 50)")
+    parser.add_argument('--malformed', type=float, default=0.0, help="fraction of malformed text lines")
+    parser.add_argument('--disconnect-after', type=float, default=None, help="seconds until a simulated unplug")
+    parser.add_argument('--load', default='walk',
+                        help="walk, still, grams per pad (e.g. 500g), or a schedule such as "
+                             "\"still,20=500g,40=walk\" (default: walk)")
+    args = parser.parse_args()
+    try:
+        schedule = parse_load(args.load)
+    except ValueError as e:
+        parser.error(str(e))
+    run_pty(WalkerSimulator(rate=args.rate, mode=args.mode, noise=args.noise, malformed_rate=args.malformed,
+                            disconnect_after=args.disconnect_after, load=schedule))
+
+
+if __name__ == '__main__':
+    main()